@@ -0,0 +1,27 @@
+"""add_roles_version
+
+Revision ID: 0a6e9d2b4c18
+Revises: f81b3d5c7a24
+Create Date: 2026-10-18 20:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0a6e9d2b4c18"
+down_revision: Union[str, None] = "f81b3d5c7a24"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column("roles", sa.Column("version", sa.Integer(), nullable=False, server_default="1"))
+
+
+def downgrade() -> None:
+    with op.batch_alter_table("roles") as batch_op:
+        batch_op.drop_column("version")
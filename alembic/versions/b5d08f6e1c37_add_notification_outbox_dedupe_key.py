@@ -0,0 +1,30 @@
+"""add_notification_outbox_dedupe_key
+
+Revision ID: b5d08f6e1c37
+Revises: 7e3a9c41d2f5
+Create Date: 2026-10-18 14:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "b5d08f6e1c37"
+down_revision: Union[str, None] = "7e3a9c41d2f5"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    with op.batch_alter_table("notification_outbox") as batch_op:
+        batch_op.add_column(sa.Column("dedupe_key", sa.Text(), nullable=True))
+        batch_op.create_unique_constraint("uq_notification_outbox_dedupe_key", ["dedupe_key"])
+
+
+def downgrade() -> None:
+    with op.batch_alter_table("notification_outbox") as batch_op:
+        batch_op.drop_constraint("uq_notification_outbox_dedupe_key", type_="unique")
+        batch_op.drop_column("dedupe_key")
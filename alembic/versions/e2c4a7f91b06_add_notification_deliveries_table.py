@@ -0,0 +1,46 @@
+"""add_notification_deliveries_table
+
+Revision ID: e2c4a7f91b06
+Revises: b5d08f6e1c37
+Create Date: 2026-10-18 16:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "e2c4a7f91b06"
+down_revision: Union[str, None] = "b5d08f6e1c37"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "notification_deliveries",
+        sa.Column("id", sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column("outbox_id", sa.Text(), nullable=False),
+        sa.Column("event_type", sa.Text(), nullable=False),
+        sa.Column("provider", sa.Text(), nullable=False),
+        sa.Column("attempt", sa.Integer(), nullable=False),
+        sa.Column("events", sa.Integer(), nullable=False, server_default="1"),
+        sa.Column("status", sa.Text(), nullable=False),
+        sa.Column("latency_ms", sa.Integer(), nullable=True),
+        sa.Column("error", sa.Text(), nullable=True),
+        sa.Column("created_at", sa.Text(), nullable=False),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index(
+        "idx_notification_deliveries_created_provider",
+        "notification_deliveries",
+        ["created_at", "provider"],
+        unique=False,
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("idx_notification_deliveries_created_provider", table_name="notification_deliveries")
+    op.drop_table("notification_deliveries")
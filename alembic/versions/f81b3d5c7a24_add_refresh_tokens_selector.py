@@ -0,0 +1,30 @@
+"""add_refresh_tokens_selector
+
+Revision ID: f81b3d5c7a24
+Revises: e2c4a7f91b06
+Create Date: 2026-10-18 18:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "f81b3d5c7a24"
+down_revision: Union[str, None] = "e2c4a7f91b06"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Существующие токены остаются без selector и проверяются argon2 до истечения
+    op.add_column("refresh_tokens", sa.Column("selector", sa.Text(), nullable=True))
+    op.create_index(op.f("ix_refresh_tokens_selector"), "refresh_tokens", ["selector"], unique=True)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f("ix_refresh_tokens_selector"), table_name="refresh_tokens")
+    with op.batch_alter_table("refresh_tokens") as batch_op:
+        batch_op.drop_column("selector")
@@ -1,25 +1,21 @@
-from typing import Optional, Set, List
+from typing import Optional
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from sqlalchemy.orm import Session, joinedload
+from sqlalchemy.orm import Session
 
 from app.database import get_db
-from app.models.user import User
-from app.models.role import Role
-from app.models.permission import Permission
-from app.models.role_permission import RolePermission
 from app.services.auth import decode_access_token
+from app.services.permissions import check_permission_claim, get_user_permissions, get_user_ui_permissions
+from app.services.principals import Principal, principal_cache
 
 security = HTTPBearer()
 
 
-def get_current_user(
+def get_token_payload(
     credentials: HTTPAuthorizationCredentials = Depends(security),
-    db: Session = Depends(get_db)
-) -> User:
-    """Получить текущего пользователя из JWT токена с загруженной ролью"""
-    token = credentials.credentials
-    payload = decode_access_token(token)
+) -> dict:
+    """Payload JWT токена (декодируется один раз за запрос)"""
+    payload = decode_access_token(credentials.credentials)
     
     if payload is None:
         raise HTTPException(
@@ -27,7 +23,14 @@ def get_current_user(
             detail="Невалидный токен авторизации",
             headers={"WWW-Authenticate": "Bearer"},
         )
-    
+    return payload
+
+
+def get_current_user(
+    payload: dict = Depends(get_token_payload),
+    db: Session = Depends(get_db)
+) -> Principal:
+    """Получить текущего пользователя из JWT токена (из кеша principal_cache)"""
     user_id: str = payload.get("sub")
     if user_id is None:
         raise HTTPException(
@@ -36,10 +39,7 @@ def get_current_user(
             headers={"WWW-Authenticate": "Bearer"},
         )
     
-    # Загружаем пользователя с ролью и правами роли
-    user = db.query(User).options(
-        joinedload(User.role).joinedload(Role.role_permissions).joinedload(RolePermission.permission)
-    ).filter(User.id == user_id).first()
+    user = principal_cache.get(user_id, db)
     
     if user is None:
         raise HTTPException(
@@ -64,9 +64,24 @@ def get_current_user(
     return user
 
 
+def get_user_from_payload(payload: dict) -> Optional[tuple[Principal, frozenset]]:
+    """
+    Загрузка пользователя и его прав по payload токена
+    (при промахе кеша - синхронный запрос к БД, вызывать вне event loop)
+    """
+    user_id: str = payload.get("sub")
+    if not user_id:
+        return None
+
+    user = principal_cache.get(user_id)
+    if user is None or not user.is_active:
+        return None
+    return user, get_user_permissions(user)
+
+
 def get_current_active_admin(
-    current_user: User = Depends(get_current_user)
-) -> User:
+    current_user: Principal = Depends(get_current_user)
+) -> Principal:
     """Проверка что текущий пользователь - админ"""
     if not current_user.is_admin:
         raise HTTPException(
@@ -76,44 +91,17 @@ def get_current_active_admin(
     return current_user
 
 
-def get_user_permissions(user: User) -> Set[str]:
-    """Получить набор прав пользователя (коды прав) - все права (бэкенд + фронтенд)"""
-    if user.is_admin:
-        # Админ имеет все права (бэкенд + фронтенд)
-        return {
-            # Бэкенд-права
-            "can_view", "can_add", "can_edit_entry", "can_delete_entry",
-            "can_mark_completed", "can_unmark_completed", "can_move_entry",
-            "can_mark_cancelled", "can_unmark_cancelled",
-            "can_mark_pass", "can_revoke_pass",
-            # Фронтенд-права
-            "can_move_ui", "can_mark_completed_ui", "can_unmark_completed_ui",
-            "can_edit_entry_ui", "can_delete_ui",
-            "can_mark_cancelled_ui", "can_unmark_cancelled_ui",
-            "can_mark_pass_ui", "can_revoke_pass_ui",
-        }
-    
-    if not user.role or not user.role.role_permissions:
-        return set()
-    
-    return {rp.permission.code for rp in user.role.role_permissions}
-
-
-def get_user_ui_permissions(user: User) -> Set[str]:
-    """Получить только UI-права пользователя (для отдачи на фронтенд)"""
-    all_permissions = get_user_permissions(user)
-    # Фильтруем только права с суффиксом _ui
-    return {perm for perm in all_permissions if perm.endswith("_ui")}
-
-
 def require_permission(permission_code: str):
     """Dependency для проверки наличия права у пользователя"""
     def check_permission(
-        current_user: User = Depends(get_current_user),
-        db: Session = Depends(get_db)
-    ) -> User:
-        permissions = get_user_permissions(current_user)
-        if permission_code not in permissions:
+        current_user: Principal = Depends(get_current_user),
+        payload: dict = Depends(get_token_payload),
+    ) -> Principal:
+        # Сначала claims токена, при их отсутствии или устаревании - права роли из кеша
+        allowed = check_permission_claim(payload, current_user, permission_code)
+        if allowed is None:
+            allowed = permission_code in get_user_permissions(current_user)
+        if not allowed:
             raise HTTPException(
                 status_code=status.HTTP_403_FORBIDDEN,
                 detail=f"Недостаточно прав: требуется право '{permission_code}'",
@@ -4,21 +4,23 @@ from sqlalchemy.orm import Session
 
 from app.database import get_db
 from app.models.user import User
+from app.models.role import Role
 from app.schemas.auth import LoginRequest, LoginResponse, RefreshRequest, RefreshResponse, LogoutRequest
 from app.schemas.user import UserResponse
 from app.config import settings
 from app.services.auth import (
-    verify_password,
+    verify_and_update_password,
     create_access_token,
     get_current_timestamp,
     generate_refresh_token,
     create_refresh_token_db,
-    cleanup_expired_tokens,
     find_refresh_token,
     find_refresh_token_by_token,
     revoke_refresh_token,
 )
 from app.api.deps import get_current_user, get_user_permissions, get_user_ui_permissions
+from app.services.permissions import build_permission_claims
+from app.services.principals import Principal
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
@@ -32,7 +34,10 @@ def login(login_data: LoginRequest, db: Session = Depends(get_db)):
         (User.username == login_data.username) | (User.email == login_data.username)
     ).first()
     
-    if not user or not verify_password(login_data.password, user.password_hash):
+    password_valid, new_password_hash = (
+        verify_and_update_password(login_data.password, user.password_hash) if user else (False, None)
+    )
+    if not password_valid:
         logger.warning(f"Неудачная попытка входа: '{login_data.username}'")
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -46,15 +51,17 @@ def login(login_data: LoginRequest, db: Session = Depends(get_db)):
             detail="Пользователь деактивирован",
         )
     
+    if new_password_hash:
+        # Параметры argon2 изменились - новый хеш сохранится вместе с refresh token
+        user.password_hash = new_password_hash
+        logger.info(f"Хеш пароля пересчитан с новыми параметрами: '{user.username}'")
+    
     # Создаем access token
-    access_token = create_access_token(data={"sub": user.id})
+    access_token = create_access_token(data={"sub": user.id, **build_permission_claims(user)})
     
     # Генерируем refresh token
     refresh_token = generate_refresh_token()
     
-    # Очищаем старые истекшие токены пользователя
-    cleanup_expired_tokens(db, user_id=user.id)
-    
     # Сохраняем refresh token в БД
     create_refresh_token_db(db, user_id=user.id, refresh_token=refresh_token)
     
@@ -62,11 +69,9 @@ def login(login_data: LoginRequest, db: Session = Depends(get_db)):
     
     # Загружаем пользователя с ролью для ответа
     from sqlalchemy.orm import joinedload
-    from app.models.role import Role
-    from app.models.role_permission import RolePermission
     
     user_with_role = db.query(User).options(
-        joinedload(User.role).joinedload(Role.role_permissions).joinedload(RolePermission.permission)
+        joinedload(User.role)
     ).filter(User.id == user.id).first()
     
     # Отдаем только UI-права на фронтенд
@@ -130,11 +135,8 @@ def refresh_token(refresh_data: RefreshRequest, db: Session = Depends(get_db)):
     # Инвалидируем старый refresh token (rotation)
     revoke_refresh_token(db, refresh_token_obj)
     
-    # Очищаем истекшие токены пользователя
-    cleanup_expired_tokens(db, user_id=user_id)
-    
     # Создаем новый access token
-    access_token = create_access_token(data={"sub": user_id})
+    access_token = create_access_token(data={"sub": user_id, **build_permission_claims(user)})
     
     # Генерируем новый refresh token
     new_refresh_token = generate_refresh_token()
@@ -171,17 +173,18 @@ def logout(logout_data: LogoutRequest, db: Session = Depends(get_db)):
 
 
 @router.get("/me", response_model=UserResponse)
-def get_me(current_user: User = Depends(get_current_user)):
+def get_me(current_user: Principal = Depends(get_current_user), db: Session = Depends(get_db)):
     """Получить информацию о текущем пользователе с ролью и правами (только UI-права)"""
     # Отдаем только UI-права на фронтенд
     ui_permissions = get_user_ui_permissions(current_user)
     
     role_info = None
-    if current_user.role:
+    role = db.query(Role).filter(Role.id == current_user.role_id).first() if current_user.role_id else None
+    if role:
         role_info = {
-            "id": current_user.role.id,
-            "name": current_user.role.name,
-            "interface_type": current_user.role.interface_type,
+            "id": role.id,
+            "name": role.name,
+            "interface_type": role.interface_type,
         }
     
     return UserResponse(
@@ -1,7 +1,5 @@
 import logging
-import time
-from datetime import datetime, timedelta
-from typing import Optional
+from datetime import datetime
 import uuid
 from fastapi import APIRouter, Depends, HTTPException, status, Query
 from sqlalchemy.orm import Session
@@ -11,7 +9,6 @@ from sqlalchemy.orm import joinedload
 from app.database import get_db
 from app.models.entry import Entry
 from app.models.pass_model import Pass
-from app.models.user import User
 from app.schemas.entry import (
     EntryCreate,
     EntryUpdate,
@@ -26,164 +23,21 @@ from app.schemas.entry import (
 )
 from app.api.deps import get_current_user, get_current_active_admin, get_user_permissions, require_permission
 from app.services.auth import get_current_timestamp
-from app.services.entry_events import broadcast_entry_event, broadcast_entry_event_with_data
-from app.services.workdays import (
-    get_previous_workday,
-    get_next_workday,
-    get_week_structure,
-    get_week_start,
-    format_date,
-)
-from pytz import timezone
+from app.services.entries import build_actor_display, build_entry_response, get_entries_data
+from app.services.entry_actions import set_entry_completed, set_visit_cancelled
+from app.services.entry_events import commit_entry_change
+from app.services.principals import Principal
 from app.config import settings
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
-tz = timezone(settings.TIMEZONE)
-
-
-def parse_date(date_str: str) -> datetime:
-    """Парсинг даты из формата YYYY-MM-DD"""
-    return datetime.strptime(date_str, "%Y-%m-%d")
-
-
-def build_entry_response(entry: Entry) -> EntryResponse:
-    pass_status = None
-    try:
-        if getattr(entry, "current_pass", None) is not None:
-            pass_status = entry.current_pass.status
-    except Exception:
-        pass_status = None
-
-    return EntryResponse(
-        id=entry.id,
-        name=entry.name,
-        responsible=entry.responsible,
-        datetime=entry.datetime,
-        created_by=entry.created_by,
-        created_at=entry.created_at,
-        updated_at=entry.updated_at,
-        updated_by=entry.updated_by,
-        is_completed=bool(entry.is_completed),
-        is_cancelled=bool(getattr(entry, "is_cancelled", 0)),
-        current_pass_id=getattr(entry, "current_pass_id", None),
-        pass_status=pass_status,
-    )
-
-
-def build_actor_display(user: User) -> str:
-    if user.full_name:
-        return user.full_name
-    return user.username
-
-
-def get_entries_data(db: Session, today: Optional[str] = None) -> dict:
-    """
-    Единая функция для получения данных недели (entries, reference_dates, calendar_structure)
-    Используется в GET /entries и для формирования WebSocket событий
-    """
-    start_time = time.time()
-    try:
-        # Определяем текущую дату
-        if today:
-            today_date = parse_date(today)
-            reference_date = tz.localize(today_date.replace(hour=0, minute=0, second=0, microsecond=0))
-        else:
-            reference_date = datetime.now(tz).replace(hour=0, minute=0, second=0, microsecond=0)
-        
-        # Получаем структуру текущей недели
-        calendar_start = time.time()
-        calendar_structure = get_week_structure(reference_date)
-        calendar_time = time.time() - calendar_start
-        logger.debug(f"get_week_structure заняло: {calendar_time:.3f}с")
-        
-        # Находим предыдущий и следующий рабочие дни
-        workdays_start = time.time()
-        previous_workday = get_previous_workday(reference_date)
-        next_workday = get_next_workday(reference_date)
-        workdays_time = time.time() - workdays_start
-        logger.debug(f"get_workdays (previous/next) заняло: {workdays_time:.3f}с")
-        
-        # Определяем диапазон дат для получения записей
-        # Текущая неделя (понедельник - воскресенье)
-        week_start = get_week_start(reference_date)
-        week_end = week_start + timedelta(days=6)
-        
-        # Добавляем предыдущий/следующий рабочие дни, если они вне текущей недели
-        date_from = week_start
-        date_to = week_end
-        if previous_workday < week_start:
-            date_from = previous_workday
-        if next_workday > week_end:
-            date_to = next_workday
-        
-        # Форматируем для фильтрации (datetime хранится как TEXT в ISO формате)
-        date_from_str = date_from.replace(hour=0, minute=0, second=0, microsecond=0).isoformat()
-        date_to_str = date_to.replace(hour=23, minute=59, second=59, microsecond=999999).isoformat()
-        
-        # Получаем записи в диапазоне дат, которые не удалены
-        db_start = time.time()
-        entries = db.query(Entry).options(joinedload(Entry.current_pass)).filter(
-            and_(
-                Entry.datetime >= date_from_str,
-                Entry.datetime <= date_to_str,
-                Entry.deleted_at.is_(None)
-            )
-        ).order_by(Entry.datetime).all()
-        db_time = time.time() - db_start
-        logger.debug(f"DB запрос занял: {db_time:.3f}с")
-        
-        # Преобразуем calendar_structure в список CalendarDay
-        calendar_days = [
-            CalendarDay(
-                date=day["date"],
-                weekday=day["weekday"],
-                is_workday=day["is_workday"],
-            )
-            for day in calendar_structure
-        ]
-        
-        # Формируем entries как список словарей
-        entries_list = [
-            EntryResponse(
-                id=entry.id,
-                name=entry.name,
-                responsible=entry.responsible,
-                datetime=entry.datetime,
-                created_by=entry.created_by,
-                created_at=entry.created_at,
-                updated_at=entry.updated_at,
-                updated_by=entry.updated_by,
-                is_completed=bool(entry.is_completed),
-                is_cancelled=bool(getattr(entry, "is_cancelled", 0)),
-                current_pass_id=getattr(entry, "current_pass_id", None),
-                pass_status=(entry.current_pass.status if getattr(entry, "current_pass", None) is not None else None),
-            ).dict()
-            for entry in entries
-        ]
-        
-        total_time = time.time() - start_time
-        logger.info(f"get_entries_data выполнено за {total_time:.3f}с (calendar: {calendar_time:.3f}с, workdays: {workdays_time:.3f}с, DB: {db_time:.3f}с)")
-        
-        return {
-            "entries": entries_list,
-            "reference_dates": {
-                "previous_workday": format_date(previous_workday),
-                "next_workday": format_date(next_workday),
-            },
-            "calendar_structure": [day.dict() for day in calendar_days],
-        }
-    except ValueError as e:
-        logger.error(f"Ошибка при получении данных недели: {str(e)}")
-        raise
-
 
 
 @router.get("/entries", response_model=EntriesListResponse)
 def get_entries(
     today: str = Query(None, description="Текущая дата в формате YYYY-MM-DD (опционально)"),
     db: Session = Depends(get_db),
-    current_user: User = Depends(require_permission("can_view")),
+    current_user: Principal = Depends(require_permission("can_view")),
 ):
     """
     Получить записи за текущую неделю + соседние рабочие дни,
@@ -209,7 +63,7 @@ def get_entries(
 def create_entry(
     entry_data: EntryCreate,
     db: Session = Depends(get_db),
-    current_user: User = Depends(require_permission("can_add")),
+    current_user: Principal = Depends(require_permission("can_add")),
 ):
     """Создать новую запись"""
     # Валидация datetime формата уже в схеме
@@ -235,21 +89,19 @@ def create_entry(
     )
     
     db.add(entry)
-    db.commit()
-    db.refresh(entry)
+    db.flush()
     
     logger.info(f"Создана запись: ID={entry.id}, name='{entry.name}', datetime={entry.datetime}, user='{current_user.username}'")
     
     entry = db.query(Entry).options(joinedload(Entry.current_pass)).filter(Entry.id == entry.id).first()
     response = build_entry_response(entry)
     
-    # Отправляем WebSocket событие с полными данными недели
-    data = get_entries_data(db)
+    # Публикуем событие (данные недели соберет фоновая рассылка)
     actor = build_actor_display(current_user)
-    broadcast_entry_event_with_data(
+    commit_entry_change(
+        db,
         event_type="entry_created",
         change_data={"entry": response.dict(), "actor": actor},
-        data=data,
     )
     
     return response
@@ -260,7 +112,7 @@ def update_entry(
     entry_id: str,
     entry_data: EntryUpdate,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
 ):
     """Обновить запись"""
     entry = db.query(Entry).filter(Entry.id == entry_id).first()
@@ -294,22 +146,20 @@ def update_entry(
     entry.updated_at = timestamp
     entry.updated_by = current_user.id
     
-    db.commit()
-    db.refresh(entry)
+    db.flush()
     
     logger.info(f"Обновлена запись: ID={entry.id}, name='{entry.name}', datetime={entry.datetime}, user='{current_user.username}'")
     
     entry = db.query(Entry).options(joinedload(Entry.current_pass)).filter(Entry.id == entry.id).first()
     response = build_entry_response(entry)
     
-    # Отправляем WebSocket событие entry_updated с полными данными недели
+    # Публикуем событие entry_updated
     # (PUT используется только для изменения name/responsible)
-    data = get_entries_data(db)
     actor = build_actor_display(current_user)
-    broadcast_entry_event_with_data(
+    commit_entry_change(
+        db,
         event_type="entry_updated",
         change_data={"entry": response.dict(), "actor": actor},
-        data=data,
     )
     
     return response
@@ -320,66 +170,11 @@ def mark_entry_completed(
     entry_id: str,
     entry_data: EntryCompletedUpdate,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
 ):
     """Отметить гостя как пришедшего (меняем только is_completed)"""
-    entry = db.query(Entry).filter(Entry.id == entry_id).first()
-    
-    if not entry:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Запись не найдена",
-        )
-    
-    if entry.deleted_at is not None:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Запись удалена",
-        )
-
     permissions = get_user_permissions(current_user)
-    if entry_data.is_completed:
-        if "can_mark_completed" not in permissions:
-            raise HTTPException(
-                status_code=status.HTTP_403_FORBIDDEN,
-                detail="Недостаточно прав: требуется право 'can_mark_completed'",
-            )
-    else:
-        if "can_unmark_completed" not in permissions:
-            raise HTTPException(
-                status_code=status.HTTP_403_FORBIDDEN,
-                detail="Недостаточно прав: требуется право 'can_unmark_completed'",
-            )
-    
-    timestamp = get_current_timestamp()
-    
-    entry.is_completed = 1 if entry_data.is_completed else 0
-    entry.updated_at = timestamp
-    entry.updated_by = current_user.id
-    
-    db.commit()
-    db.refresh(entry)
-    
-    logger.info(
-        f"Обновлена отметка прихода: ID={entry.id}, is_completed={entry.is_completed}, user='{current_user.username}'"
-    )
-    
-    entry = db.query(Entry).options(joinedload(Entry.current_pass)).filter(Entry.id == entry.id).first()
-    response = build_entry_response(entry)
-    
-    # Определяем тип события в зависимости от значения is_completed
-    event_type = "entry_completed" if entry_data.is_completed else "entry_uncompleted"
-    
-    # Отправляем WebSocket событие с полными данными недели
-    data = get_entries_data(db)
-    actor = build_actor_display(current_user)
-    broadcast_entry_event_with_data(
-        event_type=event_type,
-        change_data={"entry": response.dict(), "actor": actor},
-        data=data,
-    )
-    
-    return response
+    return set_entry_completed(db, entry_id, entry_data.is_completed, current_user, permissions)
 
 
 @router.patch("/entries/{entry_id}/cancelled", response_model=EntryResponse)
@@ -387,53 +182,11 @@ def mark_visit_cancelled(
     entry_id: str,
     entry_data: VisitCancelledUpdate,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
 ):
     """Отметить визит как отмененный (меняем только is_cancelled)"""
-    entry = db.query(Entry).filter(Entry.id == entry_id).first()
-
-    if not entry:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Запись не найдена")
-
-    if entry.deleted_at is not None:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Запись удалена")
-
     permissions = get_user_permissions(current_user)
-    if entry_data.is_cancelled:
-        if "can_mark_cancelled" not in permissions:
-            raise HTTPException(
-                status_code=status.HTTP_403_FORBIDDEN,
-                detail="Недостаточно прав: требуется право 'can_mark_cancelled'",
-            )
-    else:
-        if "can_unmark_cancelled" not in permissions:
-            raise HTTPException(
-                status_code=status.HTTP_403_FORBIDDEN,
-                detail="Недостаточно прав: требуется право 'can_unmark_cancelled'",
-            )
-
-    timestamp = get_current_timestamp()
-
-    entry.is_cancelled = 1 if entry_data.is_cancelled else 0
-    entry.updated_at = timestamp
-    entry.updated_by = current_user.id
-
-    db.commit()
-    db.refresh(entry)
-
-    entry = db.query(Entry).options(joinedload(Entry.current_pass)).filter(Entry.id == entry.id).first()
-    response = build_entry_response(entry)
-
-    event_type = "visit_cancelled" if entry_data.is_cancelled else "visit_uncancelled"
-    data = get_entries_data(db)
-    actor = build_actor_display(current_user)
-    broadcast_entry_event_with_data(
-        event_type=event_type,
-        change_data={"entry": response.dict(), "actor": actor},
-        data=data,
-    )
-
-    return response
+    return set_visit_cancelled(db, entry_id, entry_data.is_cancelled, current_user, permissions)
 
 
 def _entry_date_from_datetime(datetime_str: str) -> str:
@@ -447,7 +200,7 @@ def _entry_date_from_datetime(datetime_str: str) -> str:
 def order_pass(
     entry_id: str,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
 ):
     """Заказать пропуск (создаёт запись passes и назначает её текущей)"""
     entry = db.query(Entry).filter(Entry.id == entry_id).first()
@@ -487,18 +240,17 @@ def order_pass(
     entry.updated_at = timestamp
     entry.updated_by = current_user.id
 
-    db.commit()
+    db.flush()
 
     # Подгружаем current_pass для корректного ответа
     entry = db.query(Entry).options(joinedload(Entry.current_pass)).filter(Entry.id == entry.id).first()
     response = build_entry_response(entry)
 
-    data = get_entries_data(db)
     actor = build_actor_display(current_user)
-    broadcast_entry_event_with_data(
+    commit_entry_change(
+        db,
         event_type="pass_ordered",
         change_data={"entry": response.dict(), "actor": actor},
-        data=data,
     )
 
     return response
@@ -508,7 +260,7 @@ def order_pass(
 def revoke_pass(
     entry_id: str,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
 ):
     """Отозвать текущий пропуск (ставим status=revoked у текущей записи passes)"""
     entry = db.query(Entry).options(joinedload(Entry.current_pass)).filter(Entry.id == entry_id).first()
@@ -536,17 +288,16 @@ def revoke_pass(
     entry.updated_at = timestamp
     entry.updated_by = current_user.id
 
-    db.commit()
+    db.flush()
 
     entry = db.query(Entry).options(joinedload(Entry.current_pass)).filter(Entry.id == entry.id).first()
     response = build_entry_response(entry)
 
-    data = get_entries_data(db)
     actor = build_actor_display(current_user)
-    broadcast_entry_event_with_data(
+    commit_entry_change(
+        db,
         event_type="pass_revoked",
         change_data={"entry": response.dict(), "actor": actor},
-        data=data,
     )
 
     return response
@@ -557,7 +308,7 @@ def move_entry(
     entry_id: str,
     entry_data: EntryMoveUpdate,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
 ):
     """Переместить запись (изменить дату/время через drag&drop)"""
     entry = db.query(Entry).filter(Entry.id == entry_id).first()
@@ -598,8 +349,7 @@ def move_entry(
     entry.updated_at = timestamp
     entry.updated_by = current_user.id
     
-    db.commit()
-    db.refresh(entry)
+    db.flush()
     
     logger.info(
         f"Перемещена запись: ID={entry.id}, datetime={entry.datetime}, user='{current_user.username}'"
@@ -608,13 +358,12 @@ def move_entry(
     entry = db.query(Entry).options(joinedload(Entry.current_pass)).filter(Entry.id == entry.id).first()
     response = build_entry_response(entry)
     
-    # Отправляем WebSocket событие entry_moved с полными данными недели
-    data = get_entries_data(db)
+    # Публикуем событие entry_moved
     actor = build_actor_display(current_user)
-    broadcast_entry_event_with_data(
+    commit_entry_change(
+        db,
         event_type="entry_moved",
         change_data={"entry": response.dict(), "actor": actor},
-        data=data,
     )
     
     return response
@@ -623,7 +372,7 @@ def move_entry(
 @router.delete("/entries/all")
 def delete_all_entries(
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_admin),
+    current_user: Principal = Depends(get_current_active_admin),
 ):
     """Удалить все записи (жёсткое удаление из БД, только для админов)"""
     # Получаем все записи (включая уже удаленные)
@@ -634,18 +383,16 @@ def delete_all_entries(
     for entry in entries:
         db.delete(entry)
     
-    db.commit()
+    db.flush()
     
     logger.info(f"Жёстко удалены все записи ({deleted_count} шт.) пользователем '{current_user.username}'")
     
-    # Отправляем WebSocket событие entries_deleted_all с полными данными недели
-    # (entries будет пустым массивом после удаления)
-    data = get_entries_data(db)
+    # Публикуем событие entries_deleted_all
     actor = build_actor_display(current_user)
-    broadcast_entry_event_with_data(
+    commit_entry_change(
+        db,
         event_type="entries_deleted_all",
         change_data={"deleted_count": deleted_count, "actor": actor},
-        data=data,
     )
     
     return {
@@ -658,7 +405,7 @@ def delete_all_entries(
 def delete_entry(
     entry_id: str,
     db: Session = Depends(get_db),
-    current_user: User = Depends(require_permission("can_delete_entry")),
+    current_user: Principal = Depends(require_permission("can_delete_entry")),
 ):
     """Удалить запись (мягкое удаление)"""
     entry = db.query(Entry).filter(Entry.id == entry_id).first()
@@ -681,17 +428,16 @@ def delete_entry(
     entry.deleted_at = timestamp
     entry.deleted_by = current_user.id
     
-    db.commit()
+    db.flush()
     
     logger.info(f"Удалена запись: ID={entry.id}, name='{entry.name}', user='{current_user.username}'")
     
-    # Отправляем WebSocket событие entry_deleted с полными данными недели
-    data = get_entries_data(db)
+    # Публикуем событие entry_deleted
     actor = build_actor_display(current_user)
-    broadcast_entry_event_with_data(
+    commit_entry_change(
+        db,
         event_type="entry_deleted",
         change_data={"entry": entry_snapshot.dict(), "actor": actor},
-        data=data,
     )
     
     return {"success": True}
@@ -701,7 +447,7 @@ def delete_entry(
 def get_responsible_autocomplete(
     q: str = Query(..., description="Поисковый запрос (минимум 3 символа)"),
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
 ):
     """
     Получить варианты автокомплита для поля "Ответственный"
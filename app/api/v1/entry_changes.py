@@ -0,0 +1,148 @@
+import json
+import logging
+from typing import AsyncIterator, List, Optional
+
+import anyio
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from fastapi.responses import StreamingResponse
+
+from app.api.deps import get_user_from_payload
+from app.config import settings
+from app.services.auth import decode_access_token
+from app.services.entry_events import (
+    ENCODING_JSON,
+    PING_MESSAGE,
+    ClientConnection,
+    EncodedEvent,
+    manager as entry_event_manager,
+)
+from app.services.principals import Principal
+
+router = APIRouter()
+logger = logging.getLogger(__name__)
+
+
+class StreamPrincipal:
+    """Пользователь долгого запроса: загружается без сессии БД, которая жила бы весь ответ"""
+
+    def __init__(self, user: Principal, permissions: frozenset, token_expires_at: Optional[float]) -> None:
+        self.user = user
+        self.permissions = permissions
+        self.token_expires_at = token_expires_at
+
+
+def get_request_token(request: Request) -> Optional[str]:
+    """Токен из заголовка Authorization или query-параметра token (EventSource не умеет заголовки)"""
+    authorization = request.headers.get("authorization", "")
+    scheme, _, credentials = authorization.partition(" ")
+    if scheme.lower() == "bearer" and credentials:
+        return credentials
+    return request.query_params.get("token")
+
+
+async def get_stream_principal(request: Request) -> StreamPrincipal:
+    token = get_request_token(request)
+    payload = decode_access_token(token) if token else None
+    if payload is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Невалидный токен авторизации",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+
+    result = await anyio.to_thread.run_sync(get_user_from_payload, payload)
+    if not result:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Пользователь не найден или деактивирован",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+
+    user, permissions = result
+    if "can_view" not in permissions:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Недостаточно прав: требуется право 'can_view'",
+        )
+    return StreamPrincipal(user, permissions, payload.get("exp"))
+
+
+def parse_event_id(value: Optional[str]) -> tuple[Optional[int], Optional[str]]:
+    """Last-Event-ID вида "<stream>:<seq>" -> (seq, stream)"""
+    if not value:
+        return None, None
+    stream_id, _, seq = value.rpartition(":")
+    try:
+        return int(seq), stream_id or None
+    except ValueError:
+        return None, None
+
+
+def format_sse(message: EncodedEvent) -> str:
+    if message is PING_MESSAGE:
+        # Комментарий: держит соединение открытым для прокси, EventSource его не показывает
+        return ": ping\n\n"
+    data = message.encode(ENCODING_JSON)
+    seq = message.payload.get("seq")
+    if seq is not None:
+        return f"id: {message.payload['stream']}:{seq}\ndata: {data}\n\n"
+    return f"data: {data}\n\n"
+
+
+async def stream_messages(client: ClientConnection) -> AsyncIterator[str]:
+    try:
+        async for message in entry_event_manager.iter_messages(client):
+            yield format_sse(message)
+    finally:
+        await entry_event_manager.disconnect(client)
+
+
+@router.get("/entries/changes/stream")
+async def stream_entry_changes(
+    request: Request,
+    principal: StreamPrincipal = Depends(get_stream_principal),
+):
+    """
+    Server-Sent Events с изменениями записей - те же сообщения, что и по WebSocket
+
+    Первое сообщение - снимок недели; при переподключении EventSource передает
+    Last-Event-ID и получает только пропущенные события.
+    """
+    last_seq, stream_id = parse_event_id(
+        request.headers.get("last-event-id") or request.query_params.get("last_event_id")
+    )
+    client = await entry_event_manager.open_stream(
+        last_seq=last_seq,
+        stream_id=stream_id,
+        user=principal.user,
+        permissions=principal.permissions,
+        token_expires_at=principal.token_expires_at,
+    )
+    return StreamingResponse(
+        stream_messages(client),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.get("/entries/changes/wait")
+async def wait_entry_changes(
+    since: Optional[int] = Query(None, description="Последний полученный seq"),
+    stream: Optional[str] = Query(None, description="Идентификатор потока из предыдущего ответа"),
+    timeout: float = Query(settings.ENTRY_CHANGES_WAIT_TIMEOUT_SECONDS, ge=0, le=settings.ENTRY_CHANGES_WAIT_TIMEOUT_SECONDS),
+    principal: StreamPrincipal = Depends(get_stream_principal),
+):
+    """
+    Long-poll: сразу возвращает события с seq > since, иначе ждет следующего события
+    не дольше timeout. Без since (или если разрыв слишком большой) возвращает снимок недели
+    """
+    messages: List[EncodedEvent] = await entry_event_manager.wait_for_events(since, stream, timeout)
+    # seq для следующего запроса: последнего полученного сообщения (снимок может отставать от текущего)
+    next_seq = messages[-1].payload["seq"] if messages else since
+    # Сообщения уже сериализованы для рассылки - собираем ответ без повторной сериализации
+    body = '{"stream": "%s", "seq": %s, "messages": [%s]}' % (
+        entry_event_manager.stream_id,
+        json.dumps(next_seq),
+        ", ".join(message.encode(ENCODING_JSON) for message in messages),
+    )
+    return Response(content=body, media_type="application/json")
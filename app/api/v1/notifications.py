@@ -0,0 +1,104 @@
+import math
+from typing import Any, Dict, Optional
+
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from app.database import get_db
+from app.models.notification_delivery import NotificationDelivery
+from app.models.notification_outbox import NotificationOutbox
+from app.api.deps import get_current_active_admin
+from app.schemas.notification import NotificationMetricsResponse, NotificationQueueResponse
+from app.services.auth import get_timestamp_after
+from app.services.http_client import http_client
+from app.services.principals import Principal
+
+router = APIRouter()
+
+
+def get_latency_percentile(db: Session, provider: str, since: str, count: int, fraction: float) -> Optional[int]:
+    """Перцентиль задержки методом ближайшего ранга; сортировка и выборка строки - в БД"""
+    if not count:
+        return None
+    rank = max(math.ceil(fraction * count), 1)
+    return db.query(NotificationDelivery.latency_ms).filter(
+        NotificationDelivery.provider == provider,
+        NotificationDelivery.created_at >= since,
+        NotificationDelivery.latency_ms.isnot(None),
+    ).order_by(NotificationDelivery.latency_ms).offset(rank - 1).limit(1).scalar()
+
+
+@router.get("/notifications/queue", response_model=NotificationQueueResponse)
+def get_notification_queue(
+    db: Session = Depends(get_db),
+    current_user: Principal = Depends(get_current_active_admin),
+):
+    """
+    Глубина очереди уведомлений по провайдерам (только для админов)
+
+    Счетчики берутся из notification_outbox (общие для всех воркеров), paused_for - пауза
+    после 429 в процессе, обработавшем запрос.
+    """
+    rows = db.query(
+        NotificationOutbox.provider,
+        NotificationOutbox.status,
+        func.count(NotificationOutbox.id),
+        func.min(NotificationOutbox.created_at),
+    ).filter(
+        NotificationOutbox.status.in_(["pending", "processing", "dead"])
+    ).group_by(NotificationOutbox.provider, NotificationOutbox.status).all()
+
+    providers: Dict[str, Dict[str, Any]] = {}
+    for provider, item_status, count, oldest in rows:
+        item = providers.setdefault(provider, {"provider": provider, **http_client.get_provider_state(provider)})
+        item[item_status] = count
+        if item_status == "pending":
+            item["oldest_pending_at"] = oldest
+
+    return {"providers": [providers[provider] for provider in sorted(providers)]}
+
+
+@router.get("/notifications/metrics", response_model=NotificationMetricsResponse)
+def get_notification_metrics(
+    hours: float = Query(24, gt=0, le=24 * 90),
+    db: Session = Depends(get_db),
+    current_user: Principal = Depends(get_current_active_admin),
+):
+    """
+    Метрики доставки по провайдерам за последние hours часов (только для админов)
+
+    Считаются сообщения (сводка из нескольких событий - одно сообщение): attempts - попытки
+    отправки, events_sent - событий в доставленных сообщениях. failure_rate - доля неудачных
+    попыток (failed + dead) среди всех, кроме отказов по 429; задержка считается по
+    попыткам, дошедшим до провайдера. Агрегация выполняется в БД.
+    """
+    since = get_timestamp_after(-hours * 3600)
+    rows = db.query(
+        NotificationDelivery.provider,
+        NotificationDelivery.status,
+        func.count(NotificationDelivery.id),
+        func.sum(NotificationDelivery.events),
+        func.count(NotificationDelivery.latency_ms),
+    ).filter(
+        NotificationDelivery.created_at >= since
+    ).group_by(NotificationDelivery.provider, NotificationDelivery.status).all()
+
+    providers: Dict[str, Dict[str, Any]] = {}
+    latency_counts: Dict[str, int] = {}
+    for provider, delivery_status, count, events, latency_count in rows:
+        item = providers.setdefault(provider, {"provider": provider, "attempts": 0})
+        item["attempts"] += count
+        item[delivery_status] = count
+        if delivery_status == "sent":
+            item["events_sent"] = events or 0
+        latency_counts[provider] = latency_counts.get(provider, 0) + latency_count
+
+    for provider, item in providers.items():
+        counted = item["attempts"] - item.get("rate_limited", 0)
+        if counted:
+            item["failure_rate"] = round((item.get("failed", 0) + item.get("dead", 0)) / counted, 4)
+        item["latency_p50_ms"] = get_latency_percentile(db, provider, since, latency_counts[provider], 0.5)
+        item["latency_p95_ms"] = get_latency_percentile(db, provider, since, latency_counts[provider], 0.95)
+
+    return {"since": since, "providers": [providers[provider] for provider in sorted(providers)]}
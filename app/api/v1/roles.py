@@ -12,6 +12,9 @@ from app.schemas.role import RoleCreate, RoleUpdate, RoleResponse, RoleWithPermi
 from app.schemas.permission import PermissionResponse
 from app.api.deps import get_current_active_admin, get_user_permissions
 from app.services.auth import get_current_timestamp
+from app.services.event_bus import event_bus
+from app.services.permissions import ROLE_PERMISSIONS_CACHE
+from app.services.principals import Principal
 import uuid
 
 router = APIRouter()
@@ -20,7 +23,7 @@ router = APIRouter()
 @router.get("/roles", response_model=dict)
 def get_roles(
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_admin),
+    current_user: Principal = Depends(get_current_active_admin),
 ):
     """Получить список всех ролей (только для админов)"""
     roles = db.query(Role).options(
@@ -54,7 +57,7 @@ def get_roles(
 def get_role(
     role_id: str,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_admin),
+    current_user: Principal = Depends(get_current_active_admin),
 ):
     """Получить роль по ID (только для админов)"""
     role = db.query(Role).options(
@@ -90,7 +93,7 @@ def get_role(
 def create_role(
     role_data: RoleCreate,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_admin),
+    current_user: Principal = Depends(get_current_active_admin),
 ):
     """Создать новую роль (только для админов)"""
     # Проверяем что роль с таким именем не существует
@@ -133,6 +136,7 @@ def create_role(
             db.add(role_permission)
     
     db.commit()
+    event_bus.invalidate(ROLE_PERMISSIONS_CACHE)
     db.refresh(role)
     
     # Загружаем роль с правами для ответа
@@ -164,7 +168,7 @@ def update_role(
     role_id: str,
     role_data: RoleUpdate,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_admin),
+    current_user: Principal = Depends(get_current_active_admin),
 ):
     """Обновить роль (только для админов)"""
     role = db.query(Role).filter(Role.id == role_id).first()
@@ -207,6 +211,9 @@ def update_role(
                 detail="Одно или несколько прав не найдены",
             )
         
+        # Права в выданных access token этой роли устаревают
+        role.version = (role.version or 1) + 1
+        
         # Удаляем старые права
         db.query(RolePermission).filter(RolePermission.role_id == role_id).delete()
         
@@ -220,6 +227,7 @@ def update_role(
             db.add(role_permission)
     
     db.commit()
+    event_bus.invalidate(ROLE_PERMISSIONS_CACHE)
     db.refresh(role)
     
     # Загружаем роль с правами для ответа
@@ -250,7 +258,7 @@ def update_role(
 def delete_role(
     role_id: str,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_admin),
+    current_user: Principal = Depends(get_current_active_admin),
 ):
     """Удалить роль (только для админов)"""
     role = db.query(Role).filter(Role.id == role_id).first()
@@ -271,6 +279,7 @@ def delete_role(
     
     db.delete(role)
     db.commit()
+    event_bus.invalidate(ROLE_PERMISSIONS_CACHE)
     
     return {"success": True}
 
@@ -278,7 +287,7 @@ def delete_role(
 @router.get("/permissions", response_model=dict)
 def get_permissions(
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_admin),
+    current_user: Principal = Depends(get_current_active_admin),
 ):
     """Получить список всех доступных прав (только для админов)"""
     permissions = db.query(Permission).all()
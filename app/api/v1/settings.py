@@ -1,13 +1,13 @@
 import json
 import uuid
-from typing import Any, Dict
+from datetime import datetime
+from typing import Any, Dict, Sequence
 
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.orm import Session
 
 from app.database import get_db
 from app.models.setting import Setting
-from app.models.user import User
 from app.api.deps import get_current_active_admin
 from app.schemas.setting import (
     SettingsUpdateRequest,
@@ -15,11 +15,15 @@ from app.schemas.setting import (
     NOTIFICATION_TYPE_CODES,
 )
 from app.services.auth import get_current_timestamp
+from app.services.event_bus import event_bus
+from app.services.notification_providers import NOTIFICATION_PROVIDERS
+from app.services.principals import Principal
 from app.services.settings import (
-    build_default_notifications,
+    SETTINGS_CACHE,
     normalize_notifications,
     normalize_pass_integration,
     build_settings_metadata,
+    settings_cache,
 )
 
 router = APIRouter()
@@ -33,62 +37,40 @@ def build_settings_response(notifications: Dict[str, Any], pass_integration: Dic
     }
 
 
+def format_field_list(fields: Sequence[str]) -> str:
+    if len(fields) == 1:
+        return fields[0]
+    return f"{', '.join(fields[:-1])} и {fields[-1]}"
+
+
 @router.get("/settings", response_model=SettingsResponse, response_model_exclude_none=True)
 def get_settings(
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_admin),
+    current_user: Principal = Depends(get_current_active_admin),
 ):
     """Получить текущие настройки (только для админов)"""
-    records = db.query(Setting).all()
-    settings_data: Dict[str, Any] = {}
-
-    for record in records:
-        if record.value:
-            try:
-                settings_data[record.key] = json.loads(record.value)
-            except json.JSONDecodeError:
-                settings_data[record.key] = {}
-        else:
-            settings_data[record.key] = {}
-
-    notifications = normalize_notifications(settings_data.get("notifications"))
-    pass_integration = normalize_pass_integration(settings_data.get("pass_integration"))
-    return {
-        "notifications": notifications,
-        "pass_integration": pass_integration,
-        "metadata": build_settings_metadata(),
-    }
+    settings_data = settings_cache.get(db)
+    return build_settings_response(settings_data["notifications"], settings_data["pass_integration"])
 
 
 @router.put("/settings", response_model=SettingsResponse, response_model_exclude_none=True)
 def update_settings(
     payload: SettingsUpdateRequest,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_admin),
+    current_user: Principal = Depends(get_current_active_admin),
 ):
     """Обновить настройки (только для админов)"""
     notifications = payload.notifications
     pass_integration = payload.pass_integration
 
     # Валидация активных провайдеров
-    max_provider = notifications.providers.max_via_green_api
-    if max_provider.enabled and (
-        not max_provider.base_url
-        or not max_provider.instance_id
-        or not max_provider.api_token
-        or not max_provider.chat_id
-    ):
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Для max_via_green_api обязательны base_url, instance_id, api_token и chat_id",
-        )
-
-    telegram_provider = notifications.providers.telegram
-    if telegram_provider.enabled and (not telegram_provider.bot_token or not telegram_provider.chat_id):
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Для telegram обязательны bot_token и chat_id",
-        )
+    for code, provider in NOTIFICATION_PROVIDERS.items():
+        provider_config = getattr(notifications.providers, code).dict()
+        if provider_config.get("enabled") and provider.get_missing_fields(provider_config):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Для {code} обязательны {format_field_list(provider.required_fields)}",
+            )
 
     # Валидация типов уведомлений
     invalid_types = [
@@ -102,6 +84,16 @@ def update_settings(
             detail=f"Недопустимые типы уведомлений: {', '.join(invalid_types)}",
         )
 
+    try:
+        notifications.daily_summary_time = datetime.strptime(
+            notifications.daily_summary_time, "%H:%M"
+        ).strftime("%H:%M")
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="daily_summary_time должен быть в формате HH:MM",
+        )
+
     # Валидация pass_integration
     if pass_integration.enabled and (
         not pass_integration.base_url
@@ -153,6 +145,8 @@ def update_settings(
     db.commit()
     db.refresh(notifications_setting)
     db.refresh(pass_setting)
+    # Сбрасываем кеш настроек во всех воркерах
+    event_bus.invalidate(SETTINGS_CACHE)
 
     normalized = normalize_notifications(notifications_dict)
     normalized_pass = normalize_pass_integration(pass_dict)
@@ -8,6 +8,8 @@ from app.models.role import Role
 from app.schemas.user import UserCreate, UserUpdate, UserResponse
 from app.api.deps import get_current_active_admin, get_user_permissions
 from app.services.auth import get_password_hash, get_current_timestamp
+from app.services.event_bus import event_bus
+from app.services.principals import PRINCIPAL_CACHE, Principal
 from sqlalchemy.orm import joinedload
 from app.models.role_permission import RolePermission
 
@@ -17,7 +19,7 @@ router = APIRouter()
 @router.get("/users", response_model=dict)
 def get_users(
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_admin),
+    current_user: Principal = Depends(get_current_active_admin),
 ):
     """Получить список пользователей (только для админов)"""
     users = db.query(User).options(
@@ -57,7 +59,7 @@ def get_users(
 def create_user(
     user_data: UserCreate,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_admin),
+    current_user: Principal = Depends(get_current_active_admin),
 ):
     """Создать нового пользователя (только для админов)"""
     # Проверяем что пользователь с таким username не существует
@@ -144,7 +146,7 @@ def update_user(
     user_id: str,
     user_data: UserUpdate,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_admin),
+    current_user: Principal = Depends(get_current_active_admin),
 ):
     """Обновить пользователя (только для админов)"""
     user = db.query(User).filter(User.id == user_id).first()
@@ -217,6 +219,7 @@ def update_user(
         )
     
     db.commit()
+    event_bus.invalidate(PRINCIPAL_CACHE)
     db.refresh(user)
     
     # Загружаем пользователя с ролью для ответа
@@ -251,7 +254,7 @@ def update_user(
 def delete_user(
     user_id: str,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_admin),
+    current_user: Principal = Depends(get_current_active_admin),
 ):
     """Деактивировать пользователя (только для админов)"""
     user = db.query(User).filter(User.id == user_id).first()
@@ -271,6 +274,7 @@ def delete_user(
     
     user.is_active = 0
     db.commit()
+    event_bus.invalidate(PRINCIPAL_CACHE)
     
     return {"success": True}
 
@@ -279,7 +283,7 @@ def delete_user(
 def activate_user(
     user_id: str,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_admin),
+    current_user: Principal = Depends(get_current_active_admin),
 ):
     """Активировать пользователя (только для админов)"""
     user = db.query(User).filter(User.id == user_id).first()
@@ -292,6 +296,7 @@ def activate_user(
     
     user.is_active = 1
     db.commit()
+    event_bus.invalidate(PRINCIPAL_CACHE)
     
     # Загружаем пользователя с ролью для ответа
     user = db.query(User).options(
@@ -325,7 +330,7 @@ def activate_user(
 def deactivate_user(
     user_id: str,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_admin),
+    current_user: Principal = Depends(get_current_active_admin),
 ):
     """Деактивировать пользователя (только для админов)"""
     user = db.query(User).filter(User.id == user_id).first()
@@ -345,6 +350,7 @@ def deactivate_user(
     
     user.is_active = 0
     db.commit()
+    event_bus.invalidate(PRINCIPAL_CACHE)
     
     # Загружаем пользователя с ролью для ответа
     user = db.query(User).options(
@@ -1,63 +1,209 @@
-import asyncio
 import json
+import logging
 from typing import Optional
 
-from fastapi import APIRouter, WebSocket, WebSocketDisconnect
+import anyio
+from fastapi import APIRouter, HTTPException, WebSocket, WebSocketDisconnect, status
 
+from app.api.deps import get_user_from_payload
 from app.database import SessionLocal
-from app.models.user import User
+from app.services.admission import AdmissionRejected, ws_admission
 from app.services.auth import decode_access_token
-from app.services.entry_events import manager as entry_event_manager
+from app.services.principals import Principal
+from app.services.entry_actions import set_entry_completed, set_visit_cancelled
+from app.services.entry_events import (
+    ENCODING_JSON,
+    ENCODINGS,
+    WS_CLOSE_POLICY_VIOLATION,
+    WS_CLOSE_TRY_AGAIN_LATER,
+    ClientConnection,
+    decode_client_message,
+    manager as entry_event_manager,
+)
 
 router = APIRouter()
+logger = logging.getLogger(__name__)
 
+# Подпротоколы WebSocket для выбора формата кадров
+SUBPROTOCOL_PREFIX = "entries."
 
-def get_user_from_token(token: str) -> Optional[User]:
+# Команды охраны по WebSocket: имя команды -> действие над записью
+ENTRY_COMMANDS = {
+    "mark_completed": set_entry_completed,
+    "mark_cancelled": set_visit_cancelled,
+}
+
+
+def parse_last_seq(value: Optional[str]) -> Optional[int]:
+    if value is None or value == "":
+        return None
+    try:
+        return int(value)
+    except ValueError:
+        return None
+
+
+def select_encoding(websocket: WebSocket) -> tuple[str, Optional[str]]:
+    """
+    Формат сообщений клиента: подпротокол entries.json/entries.msgpack
+    или query-параметр encoding. Возвращает (encoding, subprotocol для accept)
+    """
+    for subprotocol in websocket.scope.get("subprotocols") or []:
+        if subprotocol.startswith(SUBPROTOCOL_PREFIX):
+            encoding = subprotocol[len(SUBPROTOCOL_PREFIX):]
+            if encoding in ENCODINGS:
+                return encoding, subprotocol
+
+    encoding = websocket.query_params.get("encoding")
+    if encoding in ENCODINGS:
+        return encoding, None
+    return ENCODING_JSON, None
+
+
+def extend_session(client: ClientConnection, token: Optional[str]) -> None:
+    """Продление сессии соединения свежим access token того же пользователя"""
+    if not token:
+        return
     payload = decode_access_token(token)
-    if payload is None:
+    if payload is None or payload.get("sub") != client.user_id:
+        return
+    client.token_expires_at = payload.get("exp")
+
+
+async def open_connection(websocket: WebSocket, token: str) -> Optional[ClientConnection]:
+    """Рукопожатие: авторизация, accept и первичные данные. None - соединение отклонено и закрыто"""
+    token_payload = decode_access_token(token)
+    if token_payload is None:
+        await websocket.close(code=WS_CLOSE_POLICY_VIOLATION)
         return None
 
-    user_id: str = payload.get("sub")
-    if not user_id:
+    result = await anyio.to_thread.run_sync(get_user_from_payload, token_payload)
+    if not result:
+        await websocket.close(code=WS_CLOSE_POLICY_VIOLATION)
         return None
+    user, permissions = result
+
+    last_seq = parse_last_seq(websocket.query_params.get("last_seq"))
+    stream_id = websocket.query_params.get("stream") or None
+    encoding, subprotocol = select_encoding(websocket)
+    return await entry_event_manager.connect(
+        websocket,
+        last_seq=last_seq,
+        stream_id=stream_id,
+        encoding=encoding,
+        subprotocol=subprotocol,
+        user=user,
+        permissions=permissions,
+        token_expires_at=token_payload.get("exp"),
+    )
+
 
+def run_entry_command(action, entry_id: str, value: bool, user: Principal, permissions: frozenset) -> dict:
+    """Выполнение команды над записью в отдельной сессии (синхронно - вызывать вне event loop)"""
     db = SessionLocal()
     try:
-        user = db.query(User).filter(User.id == user_id).first()
-        if user is None or not user.is_active:
-            return None
-        return user
+        return action(db, entry_id, value, user, permissions).dict()
     finally:
         db.close()
 
 
+async def handle_command(client: ClientConnection, payload: dict) -> None:
+    """
+    Команда охраны: {"type": "command", "id", "command", "entry_id", "value"}
+    Ответ - ack с тем же id; изменение расходится всем клиентам обычным событием
+    """
+    command_id = payload.get("id")
+    action = ENTRY_COMMANDS.get(payload.get("command"))
+    entry_id = payload.get("entry_id")
+    value = payload.get("value", True)
+    if action is None or not isinstance(entry_id, str) or not isinstance(value, bool):
+        entry_event_manager.send(client, {
+            "type": "ack",
+            "id": command_id,
+            "ok": False,
+            "status": status.HTTP_400_BAD_REQUEST,
+            "error": "Некорректная команда",
+        })
+        return
+
+    try:
+        entry = await anyio.to_thread.run_sync(
+            run_entry_command, action, entry_id, value, client.user, client.permissions
+        )
+    except HTTPException as exc:
+        entry_event_manager.send(client, {
+            "type": "ack",
+            "id": command_id,
+            "ok": False,
+            "status": exc.status_code,
+            "error": exc.detail,
+        })
+        return
+    except Exception:
+        logger.exception("Ошибка выполнения WS команды %s", payload.get("command"))
+        entry_event_manager.send(client, {
+            "type": "ack",
+            "id": command_id,
+            "ok": False,
+            "status": status.HTTP_500_INTERNAL_SERVER_ERROR,
+            "error": "Внутренняя ошибка сервера",
+        })
+        return
+
+    entry_event_manager.send(client, {"type": "ack", "id": command_id, "ok": True, "entry": entry})
+
+
+async def reject_connection(websocket: WebSocket, retry_after: float) -> None:
+    """Отказ при перегрузке: close 1013 с временем повтора в reason"""
+    await websocket.accept()
+    await websocket.close(
+        code=WS_CLOSE_TRY_AGAIN_LATER,
+        reason=json.dumps({"retry_after": retry_after}),
+    )
+
+
 @router.websocket("/ws/entries")
 async def entries_websocket(websocket: WebSocket):
     token = websocket.query_params.get("token")
     if not token:
-        await websocket.close(code=1008)
+        await websocket.close(code=WS_CLOSE_POLICY_VIOLATION)
         return
 
-    user = get_user_from_token(token)
-    if not user:
-        await websocket.close(code=1008)
+    try:
+        async with ws_admission.admit():
+            client = await open_connection(websocket, token)
+    except AdmissionRejected as exc:
+        logger.info("WS подключение отклонено из-за перегрузки, retry_after=%.1f", exc.retry_after)
+        await reject_connection(websocket, exc.retry_after)
         return
 
-    await entry_event_manager.connect(websocket)
-    ping_task = asyncio.create_task(entry_event_manager.send_ping(websocket))
+    if client is None:
+        return
 
     try:
         while True:
-            message = await websocket.receive_text()
-            try:
-                payload = json.loads(message)
-            except json.JSONDecodeError:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                raise WebSocketDisconnect(message.get("code", 1000))
+
+            entry_event_manager.mark_alive(client)
+            payload = decode_client_message(message)
+            if payload is None:
                 continue
 
-            if payload.get("type") == "pong":
+            message_type = payload.get("type")
+            if message_type == "pong":
+                continue
+            if message_type == "auth":
+                extend_session(client, payload.get("token"))
+                continue
+            if message_type == "command":
+                await handle_command(client, payload)
                 continue
     except WebSocketDisconnect:
         pass
+    except RuntimeError:
+        # Соединение закрыто сервером (например, медленный клиент отключен менеджером)
+        pass
     finally:
-        ping_task.cancel()
-        await entry_event_manager.disconnect(websocket)
+        await entry_event_manager.disconnect(client)
@@ -13,6 +13,19 @@ class Settings:
     ALGORITHM: str = os.getenv("ALGORITHM", "HS256")
     ACCESS_TOKEN_EXPIRE_MINUTES: int = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", "5"))
     REFRESH_TOKEN_EXPIRE_HOURS: int = int(os.getenv("REFRESH_TOKEN_EXPIRE_HOURS", "1"))
+    REFRESH_TOKEN_CLEANUP_AT: str = os.getenv("REFRESH_TOKEN_CLEANUP_AT", "04:00")
+    REFRESH_TOKEN_CLEANUP_BATCH_SIZE: int = int(os.getenv("REFRESH_TOKEN_CLEANUP_BATCH_SIZE", "1000"))
+    PERMISSION_CACHE_TTL_SECONDS: float = float(os.getenv("PERMISSION_CACHE_TTL_SECONDS", "300"))
+    ACCESS_TOKEN_PERMISSION_CLAIMS: bool = os.getenv("ACCESS_TOKEN_PERMISSION_CLAIMS", "true").lower() == "true"
+    PRINCIPAL_CACHE_TTL_SECONDS: float = float(os.getenv("PRINCIPAL_CACHE_TTL_SECONDS", "30"))
+    
+    # Passwords (argon2)
+    ARGON2_TIME_COST: int = int(os.getenv("ARGON2_TIME_COST", "3"))
+    ARGON2_MEMORY_COST: int = int(os.getenv("ARGON2_MEMORY_COST", "65536"))
+    ARGON2_PARALLELISM: int = int(os.getenv("ARGON2_PARALLELISM", "4"))
+    PASSWORD_HASH_WORKERS: int = int(os.getenv("PASSWORD_HASH_WORKERS", "2"))
+    PASSWORD_HASH_QUEUE_SIZE: int = int(os.getenv("PASSWORD_HASH_QUEUE_SIZE", "16"))
+    PASSWORD_HASH_TIMEOUT_SECONDS: float = float(os.getenv("PASSWORD_HASH_TIMEOUT_SECONDS", "10"))
     
     # CORS
     CORS_ORIGINS: list[str] = [
@@ -27,9 +40,56 @@ class Settings:
     # Server
     HOST: str = os.getenv("HOST", "127.0.0.1")
     PORT: int = int(os.getenv("PORT", "8000"))
+    WORKERS: int = int(os.getenv("WORKERS", "1"))
     
     # Autocomplete
     AUTOCOMPLETE_LOOKUP_LIMIT: int = int(os.getenv("AUTOCOMPLETE_LOOKUP_LIMIT", "100"))
+    
+    # WebSocket
+    WS_SEND_QUEUE_SIZE: int = int(os.getenv("WS_SEND_QUEUE_SIZE", "32"))
+    WS_SEND_TIMEOUT_SECONDS: float = float(os.getenv("WS_SEND_TIMEOUT_SECONDS", "10"))
+    WS_REPLAY_BUFFER_SIZE: int = int(os.getenv("WS_REPLAY_BUFFER_SIZE", "100"))
+    WS_PING_INTERVAL_SECONDS: float = float(os.getenv("WS_PING_INTERVAL_SECONDS", "25"))
+    WS_PONG_TIMEOUT_SECONDS: float = float(os.getenv("WS_PONG_TIMEOUT_SECONDS", "60"))
+    WS_REVALIDATE_INTERVAL_SECONDS: float = float(os.getenv("WS_REVALIDATE_INTERVAL_SECONDS", "60"))
+    WS_CONNECT_RATE: float = float(os.getenv("WS_CONNECT_RATE", "20"))
+    WS_CONNECT_BURST: float = float(os.getenv("WS_CONNECT_BURST", "40"))
+    WS_MAX_CONCURRENT_HANDSHAKES: int = int(os.getenv("WS_MAX_CONCURRENT_HANDSHAKES", "8"))
+    WS_HANDSHAKE_QUEUE_TIMEOUT_SECONDS: float = float(os.getenv("WS_HANDSHAKE_QUEUE_TIMEOUT_SECONDS", "2"))
+    WS_RETRY_JITTER_SECONDS: float = float(os.getenv("WS_RETRY_JITTER_SECONDS", "10"))
+    WS_PER_MESSAGE_DEFLATE: bool = os.getenv("WS_PER_MESSAGE_DEFLATE", "true").lower() == "true"
+    
+    # SSE / long-poll (для клиентов за прокси без WebSocket)
+    ENTRY_CHANGES_WAIT_TIMEOUT_SECONDS: float = float(os.getenv("ENTRY_CHANGES_WAIT_TIMEOUT_SECONDS", "25"))
+    
+    # Event bus
+    # memory - внутри процесса (один воркер), database - через таблицу bus_events, redis - Redis pub/sub
+    EVENT_BUS_BACKEND: str = os.getenv("EVENT_BUS_BACKEND", "memory")
+    EVENT_BUS_POLL_INTERVAL_SECONDS: float = float(os.getenv("EVENT_BUS_POLL_INTERVAL_SECONDS", "0.2"))
+    EVENT_BUS_RETENTION_SECONDS: float = float(os.getenv("EVENT_BUS_RETENTION_SECONDS", "300"))
+    EVENT_BUS_REDIS_URL: str = os.getenv("EVENT_BUS_REDIS_URL", "redis://localhost:6379/0")
+    EVENT_BUS_REDIS_CHANNEL: str = os.getenv("EVENT_BUS_REDIS_CHANNEL", "ce-guests:bus")
+    EVENT_BUS_QUEUE_SIZE: int = int(os.getenv("EVENT_BUS_QUEUE_SIZE", "1000"))
+    ENTRY_EVENTS_COALESCE_SECONDS: float = float(os.getenv("ENTRY_EVENTS_COALESCE_SECONDS", "0.5"))
+    
+    # Notifications (outbox)
+    TELEGRAM_API_BASE_URL: str = os.getenv("TELEGRAM_API_BASE_URL", "https://api.telegram.org")
+    NOTIFICATION_TIMEOUT_SECONDS: float = float(os.getenv("NOTIFICATION_TIMEOUT_SECONDS", "10"))
+    HTTP_MAX_CONNECTIONS: int = int(os.getenv("HTTP_MAX_CONNECTIONS", "20"))
+    HTTP_MAX_KEEPALIVE_CONNECTIONS: int = int(os.getenv("HTTP_MAX_KEEPALIVE_CONNECTIONS", "10"))
+    HTTP_KEEPALIVE_EXPIRY_SECONDS: float = float(os.getenv("HTTP_KEEPALIVE_EXPIRY_SECONDS", "60"))
+    HTTP_PROVIDER_MAX_CONCURRENCY: int = int(os.getenv("HTTP_PROVIDER_MAX_CONCURRENCY", "4"))
+    HTTP_PROVIDER_RATE_PER_SECOND: float = float(os.getenv("HTTP_PROVIDER_RATE_PER_SECOND", "1"))
+    HTTP_PROVIDER_RATE_BURST: float = float(os.getenv("HTTP_PROVIDER_RATE_BURST", "5"))
+    NOTIFICATION_OUTBOX_POLL_SECONDS: float = float(os.getenv("NOTIFICATION_OUTBOX_POLL_SECONDS", "5"))
+    NOTIFICATION_OUTBOX_BATCH_SIZE: int = int(os.getenv("NOTIFICATION_OUTBOX_BATCH_SIZE", "20"))
+    NOTIFICATION_MAX_ATTEMPTS: int = int(os.getenv("NOTIFICATION_MAX_ATTEMPTS", "8"))
+    NOTIFICATION_RETRY_BASE_SECONDS: float = float(os.getenv("NOTIFICATION_RETRY_BASE_SECONDS", "5"))
+    NOTIFICATION_RETRY_MAX_SECONDS: float = float(os.getenv("NOTIFICATION_RETRY_MAX_SECONDS", "900"))
+    NOTIFICATION_LOCK_TIMEOUT_SECONDS: float = float(os.getenv("NOTIFICATION_LOCK_TIMEOUT_SECONDS", "120"))
+    NOTIFICATION_HISTORY_RETENTION_DAYS: float = float(os.getenv("NOTIFICATION_HISTORY_RETENTION_DAYS", "30"))
+    NOTIFICATION_HISTORY_PRUNE_INTERVAL_SECONDS: float = float(os.getenv("NOTIFICATION_HISTORY_PRUNE_INTERVAL_SECONDS", "3600"))
+    SCHEDULER_TICK_SECONDS: float = float(os.getenv("SCHEDULER_TICK_SECONDS", "30"))
 
 
 settings = Settings()
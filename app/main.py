@@ -1,12 +1,18 @@
 import logging
-from fastapi import FastAPI, Depends
+from fastapi import FastAPI, Depends, Request, status
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 
 from app.config import settings
-from app.api.v1 import auth, entries, users, roles, settings as settings_router
+from app.api.v1 import auth, entries, entry_changes, notifications, users, roles, settings as settings_router
 from app.api import ws
 from app.api.deps import get_current_user
-from app.models.user import User
+from app.services.entry_events import start_entry_events, stop_entry_events
+from app.services.http_client import http_client
+from app.services.password_hasher import PasswordHasherBusy, password_hasher
+from app.services.principals import Principal
+from app.services.scheduler import scheduler
+from app.services import token_maintenance  # noqa: F401 - регистрирует задачу очистки refresh token
 
 # Настройка логирования
 logging.basicConfig(
@@ -29,14 +35,41 @@ app.add_middleware(
 # Подключение роутеров
 app.include_router(auth.router, prefix="/api/v1/auth", tags=["auth"])
 app.include_router(entries.router, prefix="/api/v1", tags=["entries"])
+app.include_router(entry_changes.router, prefix="/api/v1", tags=["entries"])
 app.include_router(users.router, prefix="/api/v1", tags=["users"])
 app.include_router(roles.router, prefix="/api/v1", tags=["roles"])
 app.include_router(settings_router.router, prefix="/api/v1", tags=["settings"])
+app.include_router(notifications.router, prefix="/api/v1", tags=["notifications"])
 app.include_router(ws.router, tags=["ws"])
 
 
+@app.exception_handler(PasswordHasherBusy)
+async def password_hasher_busy_handler(request: Request, exc: PasswordHasherBusy):
+    return JSONResponse(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        content={"detail": "Сервер перегружен, повторите попытку позже"},
+        headers={"Retry-After": str(max(int(exc.retry_after), 1))},
+    )
+
+
+@app.on_event("startup")
+async def on_startup():
+    password_hasher.start()
+    await http_client.start()
+    await start_entry_events()
+    await scheduler.start()
+
+
+@app.on_event("shutdown")
+async def on_shutdown():
+    await scheduler.stop()
+    await stop_entry_events()
+    await http_client.stop()
+    password_hasher.stop()
+
+
 @app.get("/")
-def read_root(current_user: User = Depends(get_current_user)):
+def read_root(current_user: Principal = Depends(get_current_user)):
     return {"message": "CE Guests API"}
 
 
@@ -6,5 +6,8 @@ from app.models.role_permission import RolePermission
 from app.models.refresh_token import RefreshToken
 from app.models.setting import Setting
 from app.models.pass_model import Pass
+from app.models.bus_event import BusEvent
+from app.models.notification_outbox import NotificationOutbox
+from app.models.notification_delivery import NotificationDelivery
 
-__all__ = ["User", "Entry", "Role", "Permission", "RolePermission", "RefreshToken", "Setting", "Pass"]
+__all__ = ["User", "Entry", "Role", "Permission", "RolePermission", "RefreshToken", "Setting", "Pass", "BusEvent", "NotificationOutbox", "NotificationDelivery"]
@@ -0,0 +1,21 @@
+from sqlalchemy import Column, Integer, Text
+
+from app.database import Base
+
+
+class BusEvent(Base):
+    """Сообщение межпроцессной шины событий (бэкенд EVENT_BUS_BACKEND=database)"""
+
+    __tablename__ = "bus_events"
+    # AUTOINCREMENT: id не переиспользуются после очистки таблицы, иначе воркеры с большим
+    # последним прочитанным id не увидят новых строк
+    __table_args__ = {"sqlite_autoincrement": True}
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    origin = Column(Text, nullable=False)
+    channel = Column(Text, nullable=False)
+    payload = Column(Text, nullable=False)
+    created_at = Column(Text, nullable=False, index=True)
+
+    def __repr__(self):
+        return f"<BusEvent(id={self.id}, channel={self.channel})>"
@@ -0,0 +1,32 @@
+from sqlalchemy import Column, Index, Integer, Text
+
+from app.database import Base
+
+
+class NotificationDelivery(Base):
+    """
+    Попытка доставки сообщения: результат и время ответа провайдера
+
+    Сводка из нескольких событий - одно сообщение и одна строка журнала (outbox_id - первая
+    строка outbox сообщения, events - число событий в нем).
+    """
+
+    __tablename__ = "notification_deliveries"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    outbox_id = Column(Text, nullable=False)
+    event_type = Column(Text, nullable=False)
+    provider = Column(Text, nullable=False)
+    attempt = Column(Integer, nullable=False)
+    events = Column(Integer, nullable=False, default=1)
+    status = Column(Text, nullable=False)  # sent, failed, dead, rate_limited
+    latency_ms = Column(Integer, nullable=True)
+    error = Column(Text, nullable=True)
+    created_at = Column(Text, nullable=False)
+
+    __table_args__ = (
+        Index("idx_notification_deliveries_created_provider", "created_at", "provider"),
+    )
+
+    def __repr__(self):
+        return f"<NotificationDelivery(id={self.id}, provider={self.provider}, status={self.status})>"
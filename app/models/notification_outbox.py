@@ -0,0 +1,39 @@
+import uuid
+
+from sqlalchemy import Column, Index, Integer, Text, UniqueConstraint
+
+from app.database import Base
+
+
+class NotificationOutbox(Base):
+    """Уведомление к отправке: одна строка на событие и провайдера"""
+
+    __tablename__ = "notification_outbox"
+
+    id = Column(Text, primary_key=True, default=lambda: str(uuid.uuid4()))
+    event_type = Column(Text, nullable=False)
+    payload = Column(Text, nullable=False)  # JSON события {"type", "change"}
+    provider = Column(Text, nullable=False)
+    # Ключ для однократной постановки (например, ежедневная сводка при нескольких воркерах)
+    dedupe_key = Column(Text, nullable=True)
+
+    status = Column(Text, nullable=False, default="pending")  # pending|processing|sent|dead
+    attempts = Column(Integer, nullable=False, default=0)
+    next_attempt_at = Column(Text, nullable=False)  # ISO timestamp
+    last_error = Column(Text, nullable=True)
+
+    # Какой процесс и когда взял строку в работу (для возврата зависших строк)
+    locked_by = Column(Text, nullable=True)
+    locked_at = Column(Text, nullable=True)  # ISO timestamp
+
+    created_at = Column(Text, nullable=False)  # ISO timestamp
+    updated_at = Column(Text, nullable=True)  # ISO timestamp
+    sent_at = Column(Text, nullable=True)  # ISO timestamp
+
+    __table_args__ = (
+        Index("idx_notification_outbox_status_next", "status", "next_attempt_at"),
+        UniqueConstraint("dedupe_key", name="uq_notification_outbox_dedupe_key"),
+    )
+
+    def __repr__(self):
+        return f"<NotificationOutbox(id={self.id}, provider={self.provider}, status={self.status})>"
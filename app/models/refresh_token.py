@@ -10,7 +10,9 @@ class RefreshToken(Base):
 
     id = Column(Text, primary_key=True, default=lambda: str(uuid.uuid4()))
     user_id = Column(Text, ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True)
-    token_hash = Column(Text, nullable=False, index=True)
+    # Открытая часть токена selector.verifier (NULL у токенов старого формата)
+    selector = Column(Text, nullable=True, unique=True, index=True)
+    token_hash = Column(Text, nullable=False, index=True)  # HMAC-SHA256 verifier (argon2 у старых токенов)
     expires_at = Column(Text, nullable=False)
     created_at = Column(Text, nullable=False)
     revoked = Column(Integer, nullable=False, default=0)
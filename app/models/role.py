@@ -13,6 +13,8 @@ class Role(Base):
     description = Column(Text, nullable=True)
     interface_type = Column(Text, nullable=False, default="user")  # "user" or "guard"
     created_at = Column(Text, nullable=False)
+    # Растет при каждом изменении прав роли - по нему устаревают права в access token
+    version = Column(Integer, nullable=False, default=1, server_default="1")
 
     # Relationships
     users = relationship("User", back_populates="role")
@@ -0,0 +1,33 @@
+from typing import List, Optional
+from pydantic import BaseModel
+
+
+class NotificationQueueProvider(BaseModel):
+    provider: str
+    pending: int = 0
+    processing: int = 0
+    dead: int = 0
+    oldest_pending_at: Optional[str] = None
+    paused_for: float = 0.0
+
+
+class NotificationQueueResponse(BaseModel):
+    providers: List[NotificationQueueProvider]
+
+
+class NotificationMetricsProvider(BaseModel):
+    provider: str
+    attempts: int = 0
+    sent: int = 0
+    failed: int = 0
+    dead: int = 0
+    rate_limited: int = 0
+    events_sent: int = 0
+    failure_rate: float = 0.0
+    latency_p50_ms: Optional[int] = None
+    latency_p95_ms: Optional[int] = None
+
+
+class NotificationMetricsResponse(BaseModel):
+    since: str
+    providers: List[NotificationMetricsProvider]
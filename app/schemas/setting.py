@@ -1,5 +1,7 @@
 from typing import List, Optional
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, create_model
+
+from app.services.notification_providers import NOTIFICATION_PROVIDERS
 
 
 NOTIFICATION_TYPES = [
@@ -20,28 +22,24 @@ NOTIFICATION_TYPES = [
 NOTIFICATION_TYPE_CODES = [item["code"] for item in NOTIFICATION_TYPES]
 
 
-class NotificationProviderMaxViaGreenApi(BaseModel):
-    enabled: bool = False
-    base_url: Optional[str] = None
-    instance_id: Optional[str] = None
-    api_token: Optional[str] = None
-    chat_id: Optional[str] = None
-
-
-class NotificationProviderTelegram(BaseModel):
-    enabled: bool = False
-    bot_token: Optional[str] = None
-    chat_id: Optional[str] = None
-
-
-class NotificationProviders(BaseModel):
-    max_via_green_api: NotificationProviderMaxViaGreenApi = Field(default_factory=NotificationProviderMaxViaGreenApi)
-    telegram: NotificationProviderTelegram = Field(default_factory=NotificationProviderTelegram)
+# Поля - схемы настроек зарегистрированных провайдеров (app/services/notification_providers.py)
+NotificationProviders = create_model(
+    "NotificationProviders",
+    **{
+        code: (provider.settings_model, Field(default_factory=provider.settings_model))
+        for code, provider in NOTIFICATION_PROVIDERS.items()
+    },
+)
 
 
 class NotificationsSettings(BaseModel):
     providers: NotificationProviders = Field(default_factory=NotificationProviders)
     enabled_notification_types: List[str] = Field(default_factory=list)
+    # Окно сводки: события за это время уходят в чат одним сообщением (0 - каждое отдельно)
+    digest_window_seconds: int = Field(0, ge=0, le=3600)
+    # Ежедневная сводка гостей следующего рабочего дня
+    daily_summary_enabled: bool = False
+    daily_summary_time: str = "18:00"  # HH:MM по TIMEZONE
 
 
 class PassIntegrationSettings(BaseModel):
@@ -61,8 +59,15 @@ class NotificationTypeMeta(BaseModel):
     title: str
 
 
+class NotificationProviderMeta(BaseModel):
+    code: str
+    title: str
+    required_fields: List[str]
+
+
 class NotificationsMeta(BaseModel):
     available_types: List[NotificationTypeMeta]
+    available_providers: List[NotificationProviderMeta]
 
 
 class SettingsMeta(BaseModel):
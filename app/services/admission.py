@@ -0,0 +1,67 @@
+import asyncio
+import logging
+import random
+from contextlib import asynccontextmanager
+from typing import AsyncIterator
+
+from app.config import settings
+from app.services.rate_limit import TokenBucket
+
+logger = logging.getLogger(__name__)
+
+
+class AdmissionRejected(Exception):
+    def __init__(self, retry_after: float) -> None:
+        super().__init__(f"retry after {retry_after:.1f}s")
+        self.retry_after = retry_after
+
+
+class ConnectionAdmission:
+    """
+    Контроль допуска новых WebSocket-соединений
+
+    Ограничивает частоту подключений (token bucket) и число одновременно выполняемых
+    рукопожатий (авторизация + accept + первичный снимок). Отклоненным клиентам выдается
+    время повтора со случайным разбросом, чтобы волна переподключений растянулась во времени.
+    """
+
+    def __init__(
+        self,
+        rate: float,
+        burst: float,
+        max_concurrent: int,
+        queue_timeout: float,
+        retry_jitter: float,
+    ) -> None:
+        self._bucket = TokenBucket(rate, burst)
+        self._semaphore = asyncio.Semaphore(max_concurrent)
+        self._queue_timeout = queue_timeout
+        self._retry_jitter = retry_jitter
+
+    def retry_after(self, base: float = 0.0) -> float:
+        return round(base + 1.0 + random.uniform(0, self._retry_jitter), 1)
+
+    @asynccontextmanager
+    async def admit(self) -> AsyncIterator[None]:
+        wait = self._bucket.try_acquire()
+        if wait > 0:
+            raise AdmissionRejected(self.retry_after(min(wait, self._retry_jitter)))
+
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), timeout=self._queue_timeout)
+        except asyncio.TimeoutError:
+            raise AdmissionRejected(self.retry_after())
+
+        try:
+            yield
+        finally:
+            self._semaphore.release()
+
+
+ws_admission = ConnectionAdmission(
+    rate=settings.WS_CONNECT_RATE,
+    burst=settings.WS_CONNECT_BURST,
+    max_concurrent=settings.WS_MAX_CONCURRENT_HANDSHAKES,
+    queue_timeout=settings.WS_HANDSHAKE_QUEUE_TIMEOUT_SECONDS,
+    retry_jitter=settings.WS_RETRY_JITTER_SECONDS,
+)
@@ -1,25 +1,30 @@
+import hashlib
+import hmac
 import secrets
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import Optional, Tuple
 from jose import JWTError, jwt
-from passlib.context import CryptContext
 from pytz import timezone
 from sqlalchemy.orm import Session
 
 from app.config import settings
 from app.models.refresh_token import RefreshToken
-
-pwd_context = CryptContext(schemes=["argon2"], deprecated="auto")
+from app.services.password_hasher import password_hasher
 
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
-    """Проверка пароля"""
-    return pwd_context.verify(plain_password, hashed_password)
+    """Проверка пароля (в пуле хеширования, при перегрузке - PasswordHasherBusy)"""
+    return password_hasher.verify(plain_password, hashed_password)
+
+
+def verify_and_update_password(plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    """Проверка пароля; второй элемент - новый хеш, если хеш создан с прежними параметрами argon2"""
+    return password_hasher.verify_and_update(plain_password, hashed_password)
 
 
 def get_password_hash(password: str) -> str:
-    """Хеширование пароля"""
-    return pwd_context.hash(password)
+    """Хеширование пароля (в пуле хеширования, при перегрузке - PasswordHasherBusy)"""
+    return password_hasher.hash(password)
 
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
@@ -49,19 +54,38 @@ def get_current_timestamp() -> str:
     return datetime.now(tz).isoformat()
 
 
+def get_timestamp_after(seconds: float) -> str:
+    """Timestamp в ISO формате через seconds секунд (отрицательное значение - в прошлом)"""
+    tz = timezone(settings.TIMEZONE)
+    return (datetime.now(tz) + timedelta(seconds=seconds)).isoformat()
+
+
 def generate_refresh_token() -> str:
-    """Генерация случайного refresh token"""
-    return secrets.token_urlsafe(32)
+    """Генерация refresh token вида selector.verifier"""
+    return f"{secrets.token_urlsafe(12)}.{secrets.token_urlsafe(32)}"
 
 
-def hash_refresh_token(token: str) -> str:
-    """Хеширование refresh token (используем тот же контекст что и для паролей)"""
-    return pwd_context.hash(token)
+def split_refresh_token(token: str) -> Optional[Tuple[str, str]]:
+    """(selector, verifier) или None для токена старого формата (без selector)"""
+    selector, separator, verifier = token.partition(".")
+    if not separator or not selector or not verifier:
+        return None
+    return selector, verifier
 
 
 def verify_refresh_token(plain_token: str, hashed_token: str) -> bool:
-    """Проверка refresh token"""
-    return pwd_context.verify(plain_token, hashed_token)
+    """Проверка refresh token старого формата"""
+    return password_hasher.verify(plain_token, hashed_token)
+
+
+def hash_refresh_token_verifier(verifier: str) -> str:
+    """
+    HMAC-SHA256 verifier на SECRET_KEY
+
+    Verifier - случайные 256 бит, подбирать его по хешу бессмысленно, поэтому медленный
+    argon2 не нужен: проверка токена - один индексный запрос по selector и один HMAC.
+    """
+    return hmac.new(settings.SECRET_KEY.encode("utf-8"), verifier.encode("utf-8"), hashlib.sha256).hexdigest()
 
 
 def create_refresh_token_db(db: Session, user_id: str, refresh_token: str) -> RefreshToken:
@@ -69,12 +93,13 @@ def create_refresh_token_db(db: Session, user_id: str, refresh_token: str) -> Re
     tz = timezone(settings.TIMEZONE)
     now = datetime.now(tz)
     expires_at = now + timedelta(hours=settings.REFRESH_TOKEN_EXPIRE_HOURS)
-    
-    token_hash = hash_refresh_token(refresh_token)
+
+    selector, verifier = split_refresh_token(refresh_token)
     
     db_token = RefreshToken(
         user_id=user_id,
-        token_hash=token_hash,
+        selector=selector,
+        token_hash=hash_refresh_token_verifier(verifier),
         expires_at=expires_at.isoformat(),
         created_at=now.isoformat(),
         revoked=0
@@ -85,50 +110,51 @@ def create_refresh_token_db(db: Session, user_id: str, refresh_token: str) -> Re
     return db_token
 
 
+def is_refresh_token_expired(token: RefreshToken) -> bool:
+    expires_at = datetime.fromisoformat(token.expires_at.replace('Z', '+00:00'))
+    if expires_at.tzinfo is None:
+        # Если нет timezone, считаем что это UTC
+        expires_at = expires_at.replace(tzinfo=timezone('UTC'))
+    return expires_at <= datetime.now(timezone(settings.TIMEZONE))
+
+
 def find_refresh_token(db: Session, user_id: str, refresh_token: str) -> Optional[RefreshToken]:
     """Поиск refresh token в БД по user_id и проверка валидности"""
-    # Получаем все неотозванные токены пользователя
-    tokens = db.query(RefreshToken).filter(
-        RefreshToken.user_id == user_id,
-        RefreshToken.revoked == 0
-    ).all()
-    
-    # Проверяем каждый токен
-    for token in tokens:
-        if verify_refresh_token(refresh_token, token.token_hash):
-            # Проверяем срок действия
-            expires_at = datetime.fromisoformat(token.expires_at.replace('Z', '+00:00'))
-            if expires_at.tzinfo is None:
-                # Если нет timezone, считаем что это UTC
-                expires_at = expires_at.replace(tzinfo=timezone('UTC'))
-            
-            tz = timezone(settings.TIMEZONE)
-            now = datetime.now(tz)
-            
-            if expires_at > now:
-                return token
-    
-    return None
-
+    return find_refresh_token_by_token(db, refresh_token, user_id=user_id)
+
+
+def find_refresh_token_by_token(
+    db: Session,
+    refresh_token: str,
+    user_id: Optional[str] = None,
+) -> Optional[RefreshToken]:
+    """
+    Поиск действующего refresh token в БД по самому токену
+
+    Токен selector.verifier ищется по индексу selector и проверяется одним HMAC. Токены,
+    выданные до перехода на этот формат (selector IS NULL), проверяются перебором argon2,
+    но только среди неистекших токенов старого формата - после ротации через /auth/refresh
+    клиент получает токен нового формата, и перебор сходит на нет.
+    """
+    query = db.query(RefreshToken).filter(RefreshToken.revoked == 0)
+    if user_id:
+        query = query.filter(RefreshToken.user_id == user_id)
 
-def find_refresh_token_by_token(db: Session, refresh_token: str) -> Optional[RefreshToken]:
-    """Поиск refresh token в БД по самому токену (без user_id)"""
-    # Получаем все неотозванные токены
-    tokens = db.query(RefreshToken).filter(RefreshToken.revoked == 0).all()
-    
-    # Проверяем каждый токен
-    for token in tokens:
+    parts = split_refresh_token(refresh_token)
+    if parts is not None:
+        selector, verifier = parts
+        token = query.filter(RefreshToken.selector == selector).first()
+        if token is None or not hmac.compare_digest(token.token_hash, hash_refresh_token_verifier(verifier)):
+            return None
+        return None if is_refresh_token_expired(token) else token
+
+    legacy_tokens = query.filter(
+        RefreshToken.selector.is_(None),
+        RefreshToken.expires_at > get_current_timestamp(),
+    ).all()
+    for token in legacy_tokens:
         if verify_refresh_token(refresh_token, token.token_hash):
-            # Проверяем срок действия
-            expires_at = datetime.fromisoformat(token.expires_at.replace('Z', '+00:00'))
-            if expires_at.tzinfo is None:
-                expires_at = expires_at.replace(tzinfo=timezone('UTC'))
-            
-            tz = timezone(settings.TIMEZONE)
-            now = datetime.now(tz)
-            
-            if expires_at > now:
-                return token
+            return None if is_refresh_token_expired(token) else token
     
     return None
 
@@ -139,21 +165,22 @@ def revoke_refresh_token(db: Session, refresh_token_obj: RefreshToken) -> None:
     db.commit()
 
 
-def cleanup_expired_tokens(db: Session, user_id: Optional[str] = None) -> int:
-    """Очистка истекших и отозванных токенов. Возвращает количество удаленных токенов"""
-    tz = timezone(settings.TIMEZONE)
-    now = datetime.now(tz)
-    now_iso = now.isoformat()
-    
-    query = db.query(RefreshToken).filter(
-        (RefreshToken.expires_at < now_iso) | (RefreshToken.revoked == 1)
-    )
-    
-    if user_id:
-        query = query.filter(RefreshToken.user_id == user_id)
-    
-    count = query.count()
-    query.delete(synchronize_session=False)
-    db.commit()
-    
-    return count
+def cleanup_expired_tokens(db: Session, batch_size: int) -> int:
+    """
+    Очистка истекших и отозванных токенов пачками по batch_size (коммит после каждой,
+    чтобы не держать блокировку БД). Возвращает количество удаленных токенов
+    """
+    now_iso = get_current_timestamp()
+    total = 0
+    while True:
+        ids = [
+            token_id for (token_id,) in db.query(RefreshToken.id).filter(
+                (RefreshToken.expires_at < now_iso) | (RefreshToken.revoked == 1)
+            ).limit(batch_size).all()
+        ]
+        if not ids:
+            return total
+        total += db.query(RefreshToken).filter(RefreshToken.id.in_(ids)).delete(synchronize_session=False)
+        db.commit()
+        if len(ids) < batch_size:
+            return total
@@ -0,0 +1,214 @@
+import asyncio
+import json
+import logging
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import anyio
+
+from app.config import settings
+from app.database import SessionLocal
+from app.models.bus_event import BusEvent
+from app.services.auth import get_current_timestamp, get_timestamp_after
+
+logger = logging.getLogger(__name__)
+
+# Сообщение транспорта: {"origin": ..., "channel": ..., "payload": {...}}
+MessageHandler = Callable[[Dict[str, Any]], None]
+# Вызывается, когда транспорт мог потерять сообщения: процесс должен сбросить свои кеши
+ResyncHandler = Callable[[], None]
+
+
+class BusBackend:
+    """
+    Транспорт шины событий между процессами (воркерами uvicorn)
+
+    send() получает пачку сообщений, on_message вызывается в event loop для каждого
+    сообщения любого процесса, включая собственные - отфильтровывает их сама шина.
+    on_resync вызывается в event loop, если часть сообщений могла быть пропущена.
+    """
+
+    name = "memory"
+    # False - события не покидают процесс (один воркер)
+    remote = False
+
+    async def start(self, on_message: MessageHandler, on_resync: ResyncHandler) -> None:
+        pass
+
+    async def stop(self) -> None:
+        pass
+
+    async def send(self, messages: List[Dict[str, Any]]) -> None:
+        pass
+
+
+class DatabaseBusBackend(BusBackend):
+    """
+    Шина через таблицу bus_events в основной БД: запись сообщений и опрос новых строк
+
+    Подходит для нескольких воркеров на одном хосте с SQLite без внешних сервисов.
+    Задержка доставки в другие процессы - до EVENT_BUS_POLL_INTERVAL_SECONDS.
+    """
+
+    name = "database"
+    remote = True
+
+    def __init__(self, poll_interval: float, retention_seconds: float) -> None:
+        self._poll_interval = poll_interval
+        self._retention_seconds = retention_seconds
+        self._last_id = 0
+        self._on_message: Optional[MessageHandler] = None
+        self._on_resync: Optional[ResyncHandler] = None
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self, on_message: MessageHandler, on_resync: ResyncHandler) -> None:
+        self._on_message = on_message
+        self._on_resync = on_resync
+        # Сообщения, записанные до запуска процесса, не нужны - начинаем с текущего конца
+        self._last_id = await anyio.to_thread.run_sync(self._max_id)
+        self._task = asyncio.create_task(self._poll_loop())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def send(self, messages: List[Dict[str, Any]]) -> None:
+        await anyio.to_thread.run_sync(self._insert, messages)
+
+    async def _poll_loop(self) -> None:
+        polls = 0
+        while True:
+            await asyncio.sleep(self._poll_interval)
+            try:
+                rows, max_id = await anyio.to_thread.run_sync(self._fetch, self._last_id)
+                if max_id is not None and max_id < self._last_id:
+                    # Нумерация id началась заново (таблица без AUTOINCREMENT была очищена):
+                    # все строки в таблице - новые, читаем их со следующего опроса, а уже
+                    # пропущенные восполняем сбросом кешей
+                    logger.warning("id в bus_events уменьшились (%d < %d), кеши сброшены", max_id, self._last_id)
+                    self._last_id = 0
+                    self._on_resync()
+                for row_id, message in rows:
+                    self._last_id = row_id
+                    self._on_message(message)
+
+                polls += 1
+                if polls * self._poll_interval >= self._retention_seconds:
+                    polls = 0
+                    await anyio.to_thread.run_sync(self._prune)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Ошибка опроса таблицы bus_events")
+
+    def _max_id(self) -> int:
+        db = SessionLocal()
+        try:
+            row = db.query(BusEvent.id).order_by(BusEvent.id.desc()).first()
+            return row[0] if row else 0
+        finally:
+            db.close()
+
+    def _insert(self, messages: List[Dict[str, Any]]) -> None:
+        db = SessionLocal()
+        try:
+            created_at = get_current_timestamp()
+            db.add_all([
+                BusEvent(
+                    origin=message["origin"],
+                    channel=message["channel"],
+                    payload=json.dumps(message["payload"], ensure_ascii=False),
+                    created_at=created_at,
+                )
+                for message in messages
+            ])
+            db.commit()
+        finally:
+            db.close()
+
+    def _fetch(self, last_id: int) -> Tuple[List[tuple], Optional[int]]:
+        """Новые строки после last_id; если их нет - еще и максимальный id (проверка сброса нумерации)"""
+        db = SessionLocal()
+        try:
+            rows = db.query(BusEvent).filter(BusEvent.id > last_id).order_by(BusEvent.id).limit(500).all()
+            max_id = None
+            if not rows:
+                row = db.query(BusEvent.id).order_by(BusEvent.id.desc()).first()
+                max_id = row[0] if row else None
+            return [
+                (row.id, {"origin": row.origin, "channel": row.channel, "payload": json.loads(row.payload)})
+                for row in rows
+            ], max_id
+        finally:
+            db.close()
+
+    def _prune(self) -> None:
+        cutoff = get_timestamp_after(-self._retention_seconds)
+        db = SessionLocal()
+        try:
+            db.query(BusEvent).filter(BusEvent.created_at < cutoff).delete(synchronize_session=False)
+            db.commit()
+        finally:
+            db.close()
+
+
+class RedisBusBackend(BusBackend):
+    """Шина через Redis pub/sub - для нескольких хостов. Требует пакет redis (не входит в requirements)"""
+
+    name = "redis"
+    remote = True
+
+    def __init__(self, url: str, channel: str) -> None:
+        self._url = url
+        self._channel = channel
+        self._client = None
+        self._pubsub = None
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self, on_message: MessageHandler, on_resync: ResyncHandler) -> None:
+        try:
+            import redis.asyncio as redis
+        except ImportError as exc:
+            raise RuntimeError("Для EVENT_BUS_BACKEND=redis установите пакет redis") from exc
+
+        self._client = redis.from_url(self._url)
+        self._pubsub = self._client.pubsub(ignore_subscribe_messages=True)
+        await self._pubsub.subscribe(self._channel)
+        self._task = asyncio.create_task(self._listen(on_message))
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        if self._pubsub is not None:
+            await self._pubsub.close()
+            self._pubsub = None
+        if self._client is not None:
+            await self._client.close()
+            self._client = None
+
+    async def send(self, messages: List[Dict[str, Any]]) -> None:
+        for message in messages:
+            await self._client.publish(self._channel, json.dumps(message, ensure_ascii=False))
+
+    async def _listen(self, on_message: MessageHandler) -> None:
+        async for item in self._pubsub.listen():
+            try:
+                on_message(json.loads(item["data"]))
+            except Exception:
+                logger.exception("Ошибка обработки сообщения шины из Redis")
+
+
+def create_bus_backend(name: str) -> BusBackend:
+    if name == "memory":
+        return BusBackend()
+    if name == "database":
+        return DatabaseBusBackend(
+            poll_interval=settings.EVENT_BUS_POLL_INTERVAL_SECONDS,
+            retention_seconds=settings.EVENT_BUS_RETENTION_SECONDS,
+        )
+    if name == "redis":
+        return RedisBusBackend(url=settings.EVENT_BUS_REDIS_URL, channel=settings.EVENT_BUS_REDIS_CHANNEL)
+    raise ValueError(f"Неизвестный EVENT_BUS_BACKEND: {name}")
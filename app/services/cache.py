@@ -0,0 +1,65 @@
+import threading
+import time
+from typing import Dict, Generic, Hashable, Optional, Tuple, TypeVar
+
+from sqlalchemy.orm import Session
+
+from app.database import SessionLocal
+from app.services.event_bus import event_bus
+
+K = TypeVar("K", bound=Hashable)
+V = TypeVar("V")
+
+
+class VersionedCache(Generic[K, V]):
+    """
+    Данные БД в памяти процесса со сбросом через шину событий
+
+    Наследник реализует load(db, key). Значение живет ttl секунд (None - до сброса); None
+    от load не кешируется. Кеш подписан на сброс по имени name: после коммита изменения
+    вызывается event_bus.invalidate(name) - кеш сбрасывается во всех воркерах. Номер версии
+    растет при каждом сбросе: загрузка, начатая до сброса, не сохранит устаревшие данные.
+    Возвращаемые значения общие для всех потоков - их нельзя изменять.
+    """
+
+    def __init__(self, name: str, ttl: Optional[float] = None) -> None:
+        self.name = name
+        self._ttl = ttl
+        self._lock = threading.Lock()
+        self._data: Dict[K, Tuple[V, float]] = {}
+        self._version = 0
+        event_bus.subscribe_invalidation(name, self.invalidate)
+
+    @property
+    def version(self) -> int:
+        return self._version
+
+    def load(self, db: Session, key: K) -> Optional[V]:
+        raise NotImplementedError
+
+    def get_value(self, key: K, db: Optional[Session] = None) -> Optional[V]:
+        """Значение из кеша или из БД (через db или собственную сессию)"""
+        cached = self._data.get(key)
+        if cached is not None and (self._ttl is None or time.monotonic() - cached[1] < self._ttl):
+            return cached[0]
+
+        version = self._version
+        if db is not None:
+            value = self.load(db, key)
+        else:
+            db = SessionLocal()
+            try:
+                value = self.load(db, key)
+            finally:
+                db.close()
+
+        if value is not None:
+            with self._lock:
+                if self._version == version:
+                    self._data[key] = (value, time.monotonic())
+        return value
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._version += 1
+            self._data = {}
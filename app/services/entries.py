@@ -0,0 +1,179 @@
+import logging
+import time
+from datetime import datetime, timedelta
+from typing import Optional
+
+from sqlalchemy import and_
+from sqlalchemy.orm import Session, joinedload
+from pytz import timezone
+
+from app.config import settings
+from app.database import SessionLocal
+from app.models.entry import Entry
+from app.schemas.entry import EntryResponse, CalendarDay
+from app.services.principals import Principal
+from app.services.workdays import (
+    get_previous_workday,
+    get_next_workday,
+    get_week_structure,
+    get_week_start,
+    format_date,
+)
+
+logger = logging.getLogger(__name__)
+tz = timezone(settings.TIMEZONE)
+
+
+def parse_date(date_str: str) -> datetime:
+    """Парсинг даты из формата YYYY-MM-DD"""
+    return datetime.strptime(date_str, "%Y-%m-%d")
+
+
+def build_entry_response(entry: Entry) -> EntryResponse:
+    pass_status = None
+    try:
+        if getattr(entry, "current_pass", None) is not None:
+            pass_status = entry.current_pass.status
+    except Exception:
+        pass_status = None
+
+    return EntryResponse(
+        id=entry.id,
+        name=entry.name,
+        responsible=entry.responsible,
+        datetime=entry.datetime,
+        created_by=entry.created_by,
+        created_at=entry.created_at,
+        updated_at=entry.updated_at,
+        updated_by=entry.updated_by,
+        is_completed=bool(entry.is_completed),
+        is_cancelled=bool(getattr(entry, "is_cancelled", 0)),
+        current_pass_id=getattr(entry, "current_pass_id", None),
+        pass_status=pass_status,
+    )
+
+
+def build_actor_display(user: Principal) -> str:
+    if user.full_name:
+        return user.full_name
+    return user.username
+
+
+def get_entries_data(db: Session, today: Optional[str] = None) -> dict:
+    """
+    Единая функция для получения данных недели (entries, reference_dates, calendar_structure)
+    Используется в GET /entries и для формирования WebSocket событий
+    """
+    start_time = time.time()
+    try:
+        # Определяем текущую дату
+        if today:
+            today_date = parse_date(today)
+            reference_date = tz.localize(today_date.replace(hour=0, minute=0, second=0, microsecond=0))
+        else:
+            reference_date = datetime.now(tz).replace(hour=0, minute=0, second=0, microsecond=0)
+        
+        # Получаем структуру текущей недели
+        calendar_start = time.time()
+        calendar_structure = get_week_structure(reference_date)
+        calendar_time = time.time() - calendar_start
+        logger.debug(f"get_week_structure заняло: {calendar_time:.3f}с")
+        
+        # Находим предыдущий и следующий рабочие дни
+        workdays_start = time.time()
+        previous_workday = get_previous_workday(reference_date)
+        next_workday = get_next_workday(reference_date)
+        workdays_time = time.time() - workdays_start
+        logger.debug(f"get_workdays (previous/next) заняло: {workdays_time:.3f}с")
+        
+        # Определяем диапазон дат для получения записей
+        # Текущая неделя (понедельник - воскресенье)
+        week_start = get_week_start(reference_date)
+        week_end = week_start + timedelta(days=6)
+        
+        # Добавляем предыдущий/следующий рабочие дни, если они вне текущей недели
+        date_from = week_start
+        date_to = week_end
+        if previous_workday < week_start:
+            date_from = previous_workday
+        if next_workday > week_end:
+            date_to = next_workday
+        
+        # Форматируем для фильтрации (datetime хранится как TEXT в ISO формате)
+        date_from_str = date_from.replace(hour=0, minute=0, second=0, microsecond=0).isoformat()
+        date_to_str = date_to.replace(hour=23, minute=59, second=59, microsecond=999999).isoformat()
+        
+        # Получаем записи в диапазоне дат, которые не удалены
+        db_start = time.time()
+        entries = db.query(Entry).options(joinedload(Entry.current_pass)).filter(
+            and_(
+                Entry.datetime >= date_from_str,
+                Entry.datetime <= date_to_str,
+                Entry.deleted_at.is_(None)
+            )
+        ).order_by(Entry.datetime).all()
+        db_time = time.time() - db_start
+        logger.debug(f"DB запрос занял: {db_time:.3f}с")
+        
+        # Преобразуем calendar_structure в список CalendarDay
+        calendar_days = [
+            CalendarDay(
+                date=day["date"],
+                weekday=day["weekday"],
+                is_workday=day["is_workday"],
+            )
+            for day in calendar_structure
+        ]
+        
+        # Формируем entries как список словарей
+        entries_list = [
+            EntryResponse(
+                id=entry.id,
+                name=entry.name,
+                responsible=entry.responsible,
+                datetime=entry.datetime,
+                created_by=entry.created_by,
+                created_at=entry.created_at,
+                updated_at=entry.updated_at,
+                updated_by=entry.updated_by,
+                is_completed=bool(entry.is_completed),
+                is_cancelled=bool(getattr(entry, "is_cancelled", 0)),
+                current_pass_id=getattr(entry, "current_pass_id", None),
+                pass_status=(entry.current_pass.status if getattr(entry, "current_pass", None) is not None else None),
+            ).dict()
+            for entry in entries
+        ]
+        
+        total_time = time.time() - start_time
+        logger.info(f"get_entries_data выполнено за {total_time:.3f}с (calendar: {calendar_time:.3f}с, workdays: {workdays_time:.3f}с, DB: {db_time:.3f}с)")
+        
+        return {
+            "entries": entries_list,
+            "reference_dates": {
+                "previous_workday": format_date(previous_workday),
+                "next_workday": format_date(next_workday),
+            },
+            "calendar_structure": [day.dict() for day in calendar_days],
+        }
+    except ValueError as e:
+        logger.error(f"Ошибка при получении данных недели: {str(e)}")
+        raise
+
+
+def build_week_snapshot() -> dict:
+    """Данные текущей недели в отдельной сессии БД (для фоновой рассылки событий)"""
+    db = SessionLocal()
+    try:
+        return get_entries_data(db)
+    finally:
+        db.close()
+
+
+def get_current_day_key() -> str:
+    """Текущая дата: данные get_entries_data без явной даты зависят только от нее"""
+    return format_date(datetime.now(tz))
+
+
+def get_current_week_key() -> str:
+    """Ключ недели, за которую строятся данные get_entries_data без явной даты"""
+    return format_date(get_week_start(datetime.now(tz)))
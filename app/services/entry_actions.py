@@ -0,0 +1,135 @@
+import logging
+from typing import AbstractSet
+
+from fastapi import HTTPException, status
+from sqlalchemy.orm import Session, joinedload
+
+from app.models.entry import Entry
+from app.schemas.entry import EntryResponse
+from app.services.auth import get_current_timestamp
+from app.services.entries import build_actor_display, build_entry_response
+from app.services.entry_events import commit_entry_change
+from app.services.principals import Principal
+
+logger = logging.getLogger(__name__)
+
+
+def set_entry_completed(
+    db: Session,
+    entry_id: str,
+    is_completed: bool,
+    user: Principal,
+    permissions: AbstractSet[str],
+) -> EntryResponse:
+    """
+    Отметить гостя как пришедшего (меняем только is_completed)
+    Используется HTTP-эндпоинтом и командой mark_completed по WebSocket
+    """
+    entry = db.query(Entry).filter(Entry.id == entry_id).first()
+    
+    if not entry:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Запись не найдена",
+        )
+    
+    if entry.deleted_at is not None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Запись удалена",
+        )
+
+    if is_completed:
+        if "can_mark_completed" not in permissions:
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail="Недостаточно прав: требуется право 'can_mark_completed'",
+            )
+    else:
+        if "can_unmark_completed" not in permissions:
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail="Недостаточно прав: требуется право 'can_unmark_completed'",
+            )
+    
+    timestamp = get_current_timestamp()
+    
+    entry.is_completed = 1 if is_completed else 0
+    entry.updated_at = timestamp
+    entry.updated_by = user.id
+    
+    db.flush()
+    
+    logger.info(
+        f"Обновлена отметка прихода: ID={entry.id}, is_completed={entry.is_completed}, user='{user.username}'"
+    )
+    
+    entry = db.query(Entry).options(joinedload(Entry.current_pass)).filter(Entry.id == entry.id).first()
+    response = build_entry_response(entry)
+    
+    # Определяем тип события в зависимости от значения is_completed
+    event_type = "entry_completed" if is_completed else "entry_uncompleted"
+    
+    # Публикуем событие (данные недели соберет фоновая рассылка)
+    actor = build_actor_display(user)
+    commit_entry_change(
+        db,
+        event_type=event_type,
+        change_data={"entry": response.dict(), "actor": actor},
+    )
+    
+    return response
+
+
+def set_visit_cancelled(
+    db: Session,
+    entry_id: str,
+    is_cancelled: bool,
+    user: Principal,
+    permissions: AbstractSet[str],
+) -> EntryResponse:
+    """
+    Отметить визит как отмененный (меняем только is_cancelled)
+    Используется HTTP-эндпоинтом и командой mark_cancelled по WebSocket
+    """
+    entry = db.query(Entry).filter(Entry.id == entry_id).first()
+
+    if not entry:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Запись не найдена")
+
+    if entry.deleted_at is not None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Запись удалена")
+
+    if is_cancelled:
+        if "can_mark_cancelled" not in permissions:
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail="Недостаточно прав: требуется право 'can_mark_cancelled'",
+            )
+    else:
+        if "can_unmark_cancelled" not in permissions:
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail="Недостаточно прав: требуется право 'can_unmark_cancelled'",
+            )
+
+    timestamp = get_current_timestamp()
+
+    entry.is_cancelled = 1 if is_cancelled else 0
+    entry.updated_at = timestamp
+    entry.updated_by = user.id
+
+    db.flush()
+
+    entry = db.query(Entry).options(joinedload(Entry.current_pass)).filter(Entry.id == entry.id).first()
+    response = build_entry_response(entry)
+
+    event_type = "visit_cancelled" if is_cancelled else "visit_uncancelled"
+    actor = build_actor_display(user)
+    commit_entry_change(
+        db,
+        event_type=event_type,
+        change_data={"entry": response.dict(), "actor": actor},
+    )
+
+    return response
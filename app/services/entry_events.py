@@ -1,70 +1,604 @@
 import asyncio
 import json
 import logging
+import time
+import uuid
+from collections import deque
+from typing import AbstractSet, AsyncIterator, Dict, List, Optional, Union
 
 import anyio
+import msgpack
 from fastapi import WebSocket
+from sqlalchemy.orm import Session
 
-from app.services.notifications import send_notifications_for_event
+from app.config import settings
+from app.database import SessionLocal
+from app.models.user import User
+from app.services.entries import build_week_snapshot, get_current_day_key, get_current_week_key
+from app.services.event_bus import event_bus
+from app.services.notification_outbox import notification_outbox
+from app.services.notifications import enqueue_notifications
+from app.services.permissions import get_user_permissions
+from app.services.principals import Principal
 
 logger = logging.getLogger(__name__)
 
+ENCODING_JSON = "json"
+ENCODING_MSGPACK = "msgpack"
+ENCODINGS = (ENCODING_JSON, ENCODING_MSGPACK)
+
+
+class EncodedEvent:
+    """Исходящее сообщение: сериализуется один раз на каждый формат и переиспользуется всеми клиентами"""
+
+    __slots__ = ("payload", "_encoded")
+
+    def __init__(self, payload: dict) -> None:
+        self.payload = payload
+        self._encoded: dict = {}
+
+    def encode(self, encoding: str) -> Union[str, bytes]:
+        data = self._encoded.get(encoding)
+        if data is None:
+            if encoding == ENCODING_MSGPACK:
+                data = msgpack.packb(self.payload, use_bin_type=True)
+            else:
+                data = json.dumps(self.payload, ensure_ascii=False)
+            self._encoded[encoding] = data
+        return data
+
+
+# Имя кеша снимка недели для сброса через шину событий
+ENTRY_SNAPSHOT_CACHE = "entry_snapshot"
+
+SNAPSHOT_REQUIRED_MESSAGE = EncodedEvent({"type": "snapshot_required"})
+PING_MESSAGE = EncodedEvent({"type": "ping"})
+
+# Коды закрытия соединения
+WS_CLOSE_POLICY_VIOLATION = 1008
+WS_CLOSE_TRY_AGAIN_LATER = 1013
+WS_CLOSE_TOKEN_EXPIRED = 4001
+WS_CLOSE_HEARTBEAT_TIMEOUT = 4002
+
+
+def decode_client_message(message: dict) -> Optional[dict]:
+    """Разобрать входящий кадр клиента: текст - JSON, бинарный - MessagePack"""
+    try:
+        if message.get("text") is not None:
+            payload = json.loads(message["text"])
+        elif message.get("bytes") is not None:
+            payload = msgpack.unpackb(message["bytes"], raw=False)
+        else:
+            return None
+    except (ValueError, msgpack.ExtraData, msgpack.FormatError, msgpack.StackError):
+        return None
+    return payload if isinstance(payload, dict) else None
+
+
+class ClientConnection:
+    """
+    Подключенный клиент: собственная ограниченная очередь исходящих сообщений и writer-задача
+
+    websocket=None - клиент SSE: сообщения из очереди забирает сам HTTP-ответ (iter_messages)
+    """
+
+    def __init__(
+        self,
+        websocket: Optional[WebSocket],
+        queue_size: int,
+        encoding: str = ENCODING_JSON,
+        user: Optional[Principal] = None,
+        permissions: AbstractSet[str] = frozenset(),
+        token_expires_at: Optional[float] = None,
+    ) -> None:
+        self.websocket = websocket
+        self.encoding = encoding
+        # Пользователь (отсоединен от сессии) и его права - для команд без повторной авторизации
+        self.user = user
+        self.user_id = user.id if user is not None else None
+        self.permissions = frozenset(permissions)
+        # Unix-время истечения access token; продлевается сообщением {"type": "auth", "token": ...}
+        self.token_expires_at = token_expires_at
+        # Время (monotonic) последнего pong или любого другого сообщения от клиента
+        self.last_seen_at = time.monotonic()
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        # Клиенту уже отправлен (или поставлен в очередь) snapshot_required
+        self.resync_pending = False
+        self.writer_task: Optional[asyncio.Task] = None
+
 
 class EntryEventManager:
     def __init__(self) -> None:
-        self._connections = set()
-        self._lock = asyncio.Lock()
+        self._connections: set[ClientConnection] = set()
+        # Идентификатор потока событий: меняется при перезапуске процесса, вместе с ним сбрасывается seq
+        self.stream_id = uuid.uuid4().hex
+        self._seq = 0
+        self._history: deque = deque(maxlen=settings.WS_REPLAY_BUFFER_SIZE)
+        self._tasks: List[asyncio.Task] = []
+        # Фоновые задачи (закрытие соединений, ресинхронизация), запущенные из синхронного кода
+        self._evict_tasks: set[asyncio.Task] = set()
+        # Последний снимок данных недели (сообщение type=snapshot) и день, для которого он построен
+        self._snapshot: Optional[EncodedEvent] = None
+        self._snapshot_day: Optional[str] = None
+        self._snapshot_lock = asyncio.Lock()
+        # Выставляется при каждой рассылке и заменяется новым - для ожидающих long-poll запросов
+        self._new_events = asyncio.Event()
+
+    async def start(self) -> None:
+        self._tasks = [
+            asyncio.create_task(self._heartbeat_loop()),
+            asyncio.create_task(self._revalidate_loop()),
+        ]
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        await asyncio.gather(*self._evict_tasks, return_exceptions=True)
+
+    @property
+    def seq(self) -> int:
+        return self._seq
+
+    async def connect(
+        self,
+        websocket: WebSocket,
+        last_seq: Optional[int] = None,
+        stream_id: Optional[str] = None,
+        encoding: str = ENCODING_JSON,
+        subprotocol: Optional[str] = None,
+        user: Optional[Principal] = None,
+        permissions: AbstractSet[str] = frozenset(),
+        token_expires_at: Optional[float] = None,
+    ) -> ClientConnection:
+        """
+        Принять соединение и зарегистрировать клиента
+
+        Если клиент передал last_seq и разрыв помещается в буфер, отправляем connected
+        и досылаем пропущенные события. Иначе первым сообщением отправляем снимок недели
+        (type=snapshot) с seq, после которого клиент применяет последующие события.
+        """
+        await websocket.accept(subprotocol=subprotocol)
+        client = ClientConnection(
+            websocket,
+            settings.WS_SEND_QUEUE_SIZE,
+            encoding=encoding,
+            user=user,
+            permissions=permissions,
+            token_expires_at=token_expires_at,
+        )
+        await self._attach(client, last_seq, stream_id)
+        client.writer_task = asyncio.create_task(self._writer(client))
+        return client
 
-    async def connect(self, websocket: WebSocket) -> None:
-        await websocket.accept()
-        async with self._lock:
-            self._connections.add(websocket)
+    async def open_stream(
+        self,
+        last_seq: Optional[int] = None,
+        stream_id: Optional[str] = None,
+        user: Optional[Principal] = None,
+        permissions: AbstractSet[str] = frozenset(),
+        token_expires_at: Optional[float] = None,
+    ) -> ClientConnection:
+        """Зарегистрировать клиента SSE: первичные сообщения те же, что у WebSocket"""
+        client = ClientConnection(
+            None,
+            settings.WS_SEND_QUEUE_SIZE,
+            user=user,
+            permissions=permissions,
+            token_expires_at=token_expires_at,
+        )
+        await self._attach(client, last_seq, stream_id)
+        return client
 
-    async def disconnect(self, websocket: WebSocket) -> None:
-        async with self._lock:
-            self._connections.discard(websocket)
+    async def iter_messages(self, client: ClientConnection) -> AsyncIterator[EncodedEvent]:
+        """Сообщения клиента SSE по мере поступления; завершается сообщением type=close"""
+        while True:
+            message = await client.queue.get()
+            yield message
+            if message is SNAPSHOT_REQUIRED_MESSAGE:
+                client.resync_pending = False
+            elif message.payload["type"] == "close":
+                return
+
+    async def _attach(self, client: ClientConnection, last_seq: Optional[int], stream_id: Optional[str]) -> None:
+        # connected (или снимок) и пропущенные события ставятся в очередь до запуска writer:
+        # разрыв, который в нее не помещается, восстанавливаем снимком, а не переполнением
+        replay_limit = client.queue.maxsize - 1
+        missed = self.events_since(last_seq, stream_id) if last_seq is not None else None
+        if missed is not None and len(missed) >= replay_limit:
+            missed = None
+        snapshot = None
+        if missed is None:
+            snapshot = await self.get_snapshot()
+
+        # Дальше без await: регистрация и досылка атомарны относительно broadcast
+        if snapshot is None:
+            self._enqueue(client, EncodedEvent({"type": "connected", "seq": self._seq, "stream": self.stream_id}))
+        else:
+            self._enqueue(client, snapshot)
+            # Пока строился снимок, могли уйти новые события - досылаем их
+            missed = self.events_since(snapshot.payload["seq"])
+            if missed is None or len(missed) >= replay_limit:
+                self._enqueue(client, SNAPSHOT_REQUIRED_MESSAGE)
+                client.resync_pending = True
+                missed = []
+
+        for message in missed:
+            self._enqueue(client, message)
+
+        self._connections.add(client)
+
+    async def disconnect(self, client: ClientConnection) -> None:
+        self._connections.discard(client)
+        if client.writer_task is not None and client.writer_task is not asyncio.current_task():
+            client.writer_task.cancel()
+
+    def events_since(self, last_seq: int, stream_id: Optional[str] = None) -> Optional[List[EncodedEvent]]:
+        """Сообщения с seq > last_seq из буфера; None если восстановить разрыв по буферу нельзя"""
+        if stream_id is not None and stream_id != self.stream_id:
+            return None
+        if last_seq > self._seq or last_seq < 0:
+            return None
+        if last_seq == self._seq:
+            return []
+        if not self._history or self._history[0][0] > last_seq + 1:
+            return None
+        return [message for seq, message in self._history if seq > last_seq]
+
+    async def wait_for_events(
+        self,
+        since: Optional[int],
+        stream_id: Optional[str],
+        timeout: float,
+    ) -> List[EncodedEvent]:
+        """
+        Long-poll: сообщения с seq > since, при их отсутствии - ожидание следующей рассылки
+        не дольше timeout. Если разрыв не восстанавливается по буферу - снимок недели
+
+        seq другого потока (запрос попал на другой воркер) тоже не восстанавливается, но
+        снимок отдается только после следующей рассылки или по истечении timeout: иначе при
+        нескольких воркерах каждый запрос сразу получал бы полный снимок.
+        """
+        if since is None:
+            return [await self.get_snapshot()]
+
+        if stream_id is not None and stream_id != self.stream_id:
+            try:
+                await asyncio.wait_for(self._new_events.wait(), timeout=timeout)
+            except asyncio.TimeoutError:
+                pass
+            return [await self.get_snapshot()]
+
+        missed = self.events_since(since, stream_id)
+        if missed is None:
+            return [await self.get_snapshot()]
+        if missed:
+            return missed
+
+        try:
+            await asyncio.wait_for(self._new_events.wait(), timeout=timeout)
+        except asyncio.TimeoutError:
+            return []
+
+        missed = self.events_since(since, stream_id)
+        if missed is None:
+            return [await self.get_snapshot()]
+        return missed
+
+    def _is_snapshot_fresh(self) -> bool:
+        return self._snapshot is not None and self._snapshot_day == get_current_day_key()
+
+    def _set_snapshot(self, data: dict, seq: int) -> None:
+        self._snapshot = EncodedEvent({"type": "snapshot", "seq": seq, "stream": self.stream_id, "data": data})
+        self._snapshot_day = get_current_day_key()
+
+    async def get_snapshot(self) -> EncodedEvent:
+        """
+        Снимок данных текущей недели из кеша
+
+        Кеш обновляется каждой рассылкой с данными недели. При пустом или устаревшем кеше
+        снимок строится один раз, одновременные подключения ждут этой же сборки.
+        """
+        if self._is_snapshot_fresh():
+            return self._snapshot
+
+        async with self._snapshot_lock:
+            if self._is_snapshot_fresh():
+                return self._snapshot
+
+            seq = self._seq
+            data = await anyio.to_thread.run_sync(build_week_snapshot)
+            # Пока строили, рассылка могла положить более свежий снимок
+            if not self._is_snapshot_fresh() or self._snapshot.payload["seq"] < seq:
+                self._set_snapshot(data, seq)
+            return self._snapshot
 
     async def broadcast(self, payload: dict) -> None:
-        message = json.dumps(payload, ensure_ascii=False)
-        async with self._lock:
-            connections = list(self._connections)
+        """Раздать событие всем клиентам: только постановка в очереди, без ожидания отправки"""
+        self._seq += 1
+        message = EncodedEvent({**payload, "seq": self._seq, "stream": self.stream_id})
+        self._history.append((self._seq, message))
+        if "data" in payload:
+            self._set_snapshot(payload["data"], self._seq)
+
+        for client in list(self._connections):
+            self._enqueue(client, message)
+
+        self._new_events.set()
+        self._new_events = asyncio.Event()
+
+    def request_resync(self) -> None:
+        """broadcast_resync из синхронного обработчика сброса кеша (вызывается в event loop)"""
+        task = asyncio.create_task(self.broadcast_resync())
+        self._evict_tasks.add(task)
+        task.add_done_callback(self._evict_tasks.discard)
+
+    async def broadcast_resync(self) -> None:
+        """Данные недели не удалось разослать: сбросить кеш снимка и попросить клиентов перезапросить их"""
+        self._snapshot = None
+        await self.broadcast({"type": "snapshot_required"})
 
-        for websocket in connections:
+    def _enqueue(self, client: ClientConnection, message: EncodedEvent) -> None:
+        try:
+            client.queue.put_nowait(message)
+            return
+        except asyncio.QueueFull:
+            pass
+
+        if client.resync_pending:
+            # Клиент не успел получить даже запрос на ресинхронизацию - отключаем
+            logger.info("WS клиент не успевает получать события, соединение закрывается")
+            # Убираем из рассылки сразу, чтобы следующие события не запускали повторное закрытие
+            self._connections.discard(client)
+            task = asyncio.create_task(self._evict(client))
+            self._evict_tasks.add(task)
+            task.add_done_callback(self._evict_tasks.discard)
+            return
+
+        # Очередь переполнена: выбрасываем накопленные события, клиент перезапросит данные целиком
+        logger.info("WS клиент отстал, очередь очищена, отправлен snapshot_required")
+        while not client.queue.empty():
+            client.queue.get_nowait()
+        client.queue.put_nowait(SNAPSHOT_REQUIRED_MESSAGE)
+        client.resync_pending = True
+
+    async def _writer(self, client: ClientConnection) -> None:
+        try:
+            while True:
+                message = await client.queue.get()
+                data = message.encode(client.encoding)
+                if isinstance(data, bytes):
+                    send = client.websocket.send_bytes(data)
+                else:
+                    send = client.websocket.send_text(data)
+                await asyncio.wait_for(send, timeout=settings.WS_SEND_TIMEOUT_SECONDS)
+                if message is SNAPSHOT_REQUIRED_MESSAGE:
+                    client.resync_pending = False
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.debug("WS send failed, removing connection", exc_info=True)
+            await self._evict(client)
+
+    async def _evict(self, client: ClientConnection, code: int = WS_CLOSE_TRY_AGAIN_LATER) -> None:
+        await self.disconnect(client)
+        if client.websocket is None:
+            # SSE: вместо накопленного - сообщение о закрытии, ответ завершится на нем
+            while not client.queue.empty():
+                client.queue.get_nowait()
+            client.queue.put_nowait(EncodedEvent({"type": "close", "code": code}))
+            return
+        try:
+            await asyncio.wait_for(
+                client.websocket.close(code=code),
+                timeout=settings.WS_SEND_TIMEOUT_SECONDS,
+            )
+        except Exception:
+            logger.debug("WS close failed", exc_info=True)
+
+    async def _revalidate_loop(self) -> None:
+        while True:
+            await asyncio.sleep(settings.WS_REVALIDATE_INTERVAL_SECONDS)
             try:
-                await websocket.send_text(message)
+                await self.revalidate()
+            except asyncio.CancelledError:
+                raise
             except Exception:
-                logger.debug("WS send failed, removing connection", exc_info=True)
-                await self.disconnect(websocket)
+                logger.exception("Ошибка перепроверки WebSocket-сессий")
 
-    async def send_ping(self, websocket: WebSocket, interval: float = 25.0) -> None:
+    async def revalidate(self) -> None:
+        """
+        Перепроверка долгоживущих соединений: закрываем соединения с истекшим токеном
+        и соединения пользователей, которые удалены или деактивированы, остальным
+        обновляем закешированные права (одним запросом на всех)
+        """
+        now = time.time()
+        expired = []
+        alive = []
+        for client in list(self._connections):
+            if client.token_expires_at is not None and client.token_expires_at <= now:
+                expired.append(client)
+            elif client.user_id is not None:
+                alive.append(client)
+
+        revoked = []
+        user_ids = {client.user_id for client in alive}
+        if user_ids:
+            active_permissions = await anyio.to_thread.run_sync(load_active_user_permissions, user_ids)
+            for client in alive:
+                if client.user_id in active_permissions:
+                    client.permissions = active_permissions[client.user_id]
+                else:
+                    revoked.append(client)
+
+        if expired or revoked:
+            logger.info(
+                "WS перепроверка: закрыто %d соединений с истекшим токеном, %d неактивных пользователей",
+                len(expired),
+                len(revoked),
+            )
+        await asyncio.gather(
+            *(self._evict(client, code=WS_CLOSE_TOKEN_EXPIRED) for client in expired),
+            *(self._evict(client, code=WS_CLOSE_POLICY_VIOLATION) for client in revoked),
+        )
+
+    def send(self, client: ClientConnection, payload: dict) -> None:
+        """Сообщение одному клиенту (например, ответ на команду)"""
+        self._enqueue(client, EncodedEvent(payload))
+
+    def mark_alive(self, client: ClientConnection) -> None:
+        client.last_seen_at = time.monotonic()
+
+    async def _heartbeat_loop(self) -> None:
         while True:
-            await asyncio.sleep(interval)
-            await websocket.send_text(json.dumps({"type": "ping"}))
+            await asyncio.sleep(settings.WS_PING_INTERVAL_SECONDS)
+            try:
+                await self.heartbeat()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Ошибка heartbeat WebSocket-соединений")
 
+    async def heartbeat(self) -> None:
+        """Один проход по всем соединениям: ping живым, закрытие не ответивших за WS_PONG_TIMEOUT_SECONDS"""
+        deadline = time.monotonic() - settings.WS_PONG_TIMEOUT_SECONDS
+        dead = []
+        for client in list(self._connections):
+            # Клиенты SSE не отвечают на ping - их обрыв обнаруживает сам HTTP-ответ
+            if client.websocket is not None and client.last_seen_at < deadline:
+                dead.append(client)
+            else:
+                self._enqueue(client, PING_MESSAGE)
 
-manager = EntryEventManager()
+        if dead:
+            logger.info("WS heartbeat: закрыто %d соединений без ответа на ping", len(dead))
+            await asyncio.gather(*(self._evict(client, code=WS_CLOSE_HEARTBEAT_TIMEOUT) for client in dead))
 
 
-def broadcast_entry_event(payload: dict) -> None:
+def load_active_user_permissions(user_ids: set) -> Dict[str, frozenset]:
+    """Права активных пользователей из набора (одним запросом); неактивных и удаленных в ответе нет"""
+    db = SessionLocal()
     try:
-        anyio.from_thread.run(manager.broadcast, payload)
-    except RuntimeError:
-        logger.debug("WS broadcast skipped: no running event loop")
+        users = db.query(User).filter(User.id.in_(user_ids), User.is_active == 1).all()
+        return {user.id: get_user_permissions(user) for user in users}
+    finally:
+        db.close()
+
+
+class EntryEventCoalescer:
+    """
+    Склейка серий событий перед рассылкой клиентам
+
+    Первое событие недели открывает окно ENTRY_EVENTS_COALESCE_SECONDS; по его окончании
+    данные недели строятся один раз и клиентам уходит одно сообщение на все события окна.
+    События, пришедшие во время сборки данных, попадают в следующее окно, которое
+    открывается после рассылки текущего, поэтому последнее изменение всегда доходит до
+    клиентов и сообщения недели идут в порядке сборки данных.
+    """
+
+    def __init__(self, manager: EntryEventManager) -> None:
+        self._manager = manager
+        self._pending: Dict[str, List[dict]] = {}
+        self._flush_tasks: Dict[str, asyncio.Task] = {}
+
+    async def add(self, event: dict) -> None:
+        week_key = get_current_week_key()
+        self._pending.setdefault(week_key, []).append(event)
+        if week_key not in self._flush_tasks:
+            self._flush_tasks[week_key] = asyncio.create_task(self._flush_loop(week_key))
+
+    async def stop(self) -> None:
+        tasks = list(self._flush_tasks.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._flush_tasks.clear()
+        self._pending.clear()
+
+    async def _flush_loop(self, week_key: str) -> None:
+        # Задача недели остается зарегистрированной до конца рассылки: следующее окно
+        # открывается только после нее, и более старые данные не перезапишут новые
+        try:
+            while self._pending.get(week_key):
+                await asyncio.sleep(settings.ENTRY_EVENTS_COALESCE_SECONDS)
+                await self._flush(self._pending.pop(week_key, []))
+        finally:
+            self._flush_tasks.pop(week_key, None)
+
+    async def _flush(self, events: List[dict]) -> None:
+        try:
+            data = await anyio.to_thread.run_sync(build_week_snapshot)
+        except Exception:
+            logger.exception("Ошибка сборки данных недели, клиентам отправлен snapshot_required")
+            await self._manager.broadcast_resync()
+            return
+        await self._manager.broadcast(build_batch_payload(events, data))
 
 
-def broadcast_entry_event_with_data(event_type: str, change_data: dict, data: dict) -> None:
+def build_batch_payload(events: List[dict], data: dict) -> dict:
+    """Одно событие отправляется как есть, несколько - как entries_batch со списком изменений"""
+    if len(events) == 1:
+        return {"type": events[0]["type"], "data": data, "change": events[0]["change"]}
+    return {
+        "type": "entries_batch",
+        "data": data,
+        "changes": [{"type": event["type"], "change": event["change"]} for event in events],
+    }
+
+
+manager = EntryEventManager()
+coalescer = EntryEventCoalescer(manager)
+
+
+async def _wake_notification_outbox(event: dict) -> None:
+    # Строки outbox уже закоммичены вместе с изменением - не ждем очередного опроса таблицы
+    notification_outbox.wake()
+
+
+event_bus.subscribe("websocket", coalescer.add)
+# Шина могла потерять события других воркеров: снимок устарел, клиенты перезапрашивают данные
+event_bus.subscribe_invalidation(ENTRY_SNAPSHOT_CACHE, manager.request_resync)
+# Уведомления отправляет только процесс, в котором произошло изменение
+event_bus.subscribe("notifications", _wake_notification_outbox, local_only=True)
+
+
+async def start_entry_events() -> None:
+    await event_bus.start()
+    await manager.start()
+    await notification_outbox.start()
+
+
+async def stop_entry_events() -> None:
+    await notification_outbox.stop()
+    await manager.stop()
+    await coalescer.stop()
+    await event_bus.stop()
+
+
+def publish_entry_event(event_type: str, change_data: dict) -> None:
     """
-    Отправка WebSocket события с полной структурой данных недели
-    
+    Публикация события об изменении записей
+
+    Возвращает управление сразу: данные недели для клиентов собираются при рассылке
+    (один раз на окно склейки). Уведомления сюда не относятся - см. commit_entry_change.
+
     Args:
         event_type: Тип события (entry_created, entry_updated, etc.)
         change_data: Данные об изменении (для поля change)
-        data: Полные данные недели (entries, reference_dates, calendar_structure)
     """
-    payload = {
-        "type": event_type,
-        "data": data,
-        "change": change_data,
-    }
-    broadcast_entry_event(payload)
-    send_notifications_for_event(event_type, payload)
+    event_bus.publish({"type": event_type, "change": change_data})
+
+
+def commit_entry_change(db: Session, event_type: str, change_data: dict) -> None:
+    """
+    Зафиксировать изменение записей и разослать событие
+
+    Уведомления ставятся в outbox в той же транзакции, что и само изменение, поэтому
+    падение процесса после коммита не теряет их. Событие для клиентов публикуется
+    только после успешного коммита.
+    """
+    event = {"type": event_type, "change": change_data}
+    enqueue_notifications(db, event_type, event)
+    db.commit()
+    publish_entry_event(event_type, change_data)
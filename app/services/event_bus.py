@@ -0,0 +1,220 @@
+import asyncio
+import logging
+import uuid
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from app.config import settings
+from app.services.bus_backends import BusBackend, create_bus_backend
+
+logger = logging.getLogger(__name__)
+
+EventHandler = Callable[[Dict[str, Any]], Awaitable[None]]
+InvalidationHandler = Callable[[], None]
+
+# Каналы межпроцессного транспорта
+CHANNEL_EVENTS = "events"
+CHANNEL_INVALIDATE = "invalidate"
+# Получатель сбрасывает все кеши: отправитель потерял часть своих сообщений
+CHANNEL_RESYNC = "resync"
+
+# Попытки отправки пачки в транспорт и пауза между ними (удваивается)
+SEND_ATTEMPTS = 5
+SEND_RETRY_DELAY_SECONDS = 0.5
+
+
+class _Subscriber:
+    def __init__(self, name: str, handler: EventHandler, local_only: bool) -> None:
+        self.name = name
+        self.handler = handler
+        self.local_only = local_only
+        self.queue: Optional[asyncio.Queue] = None
+        self.task: Optional[asyncio.Task] = None
+
+
+class EventBus:
+    """
+    Шина событий
+
+    publish() только ставит событие в очереди подписчиков и сразу возвращает управление
+    (можно вызывать из синхронных эндпоинтов в threadpool). Каждый подписчик обрабатывает
+    события в своей задаче, поэтому медленный подписчик не задерживает остальных.
+
+    При нескольких воркерах события и инвалидации кешей пересылаются остальным процессам
+    через бэкенд EVENT_BUS_BACKEND. Подписчики с local_only=True (например, внешние
+    уведомления) получают только события своего процесса, чтобы они выполнялись один раз.
+    Если пачку не удалось отправить после SEND_ATTEMPTS попыток или очередь отправки
+    переполнилась, после восстановления транспорта остальные процессы получают
+    CHANNEL_RESYNC и сбрасывают кеши (клиенты получают свежий снимок недели).
+    """
+
+    def __init__(self, backend: BusBackend) -> None:
+        self._backend = backend
+        # Идентификатор процесса: свои сообщения, вернувшиеся из транспорта, пропускаем
+        self._origin = uuid.uuid4().hex
+        self._subscribers: List[_Subscriber] = []
+        self._invalidation_handlers: Dict[str, List[InvalidationHandler]] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._outbox: Optional[asyncio.Queue] = None
+        self._sender_task: Optional[asyncio.Task] = None
+        # Часть исходящих сообщений потеряна - с ближайшей пачкой отправить CHANNEL_RESYNC
+        self._lost = False
+
+    def subscribe(self, name: str, handler: EventHandler, local_only: bool = False) -> None:
+        self._subscribers.append(_Subscriber(name, handler, local_only))
+
+    def subscribe_invalidation(self, name: str, handler: InvalidationHandler) -> None:
+        """Сброс кеша name: вызывается в процессе-источнике сразу, в остальных - при получении"""
+        self._invalidation_handlers.setdefault(name, []).append(handler)
+
+    async def start(self) -> None:
+        self._loop = asyncio.get_running_loop()
+        for subscriber in self._subscribers:
+            subscriber.queue = asyncio.Queue(maxsize=settings.EVENT_BUS_QUEUE_SIZE)
+            subscriber.task = asyncio.create_task(self._consume(subscriber))
+
+        if self._backend.remote:
+            self._outbox = asyncio.Queue(maxsize=settings.EVENT_BUS_QUEUE_SIZE)
+            await self._backend.start(self._receive, self._resync)
+            self._sender_task = asyncio.create_task(self._send_loop())
+            logger.info("Межпроцессная шина событий: %s", self._backend.name)
+
+    async def stop(self) -> None:
+        tasks = [s.task for s in self._subscribers if s.task is not None]
+        if self._sender_task is not None:
+            tasks.append(self._sender_task)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        await self._backend.stop()
+
+        for subscriber in self._subscribers:
+            subscriber.task = None
+            subscriber.queue = None
+        self._sender_task = None
+        self._outbox = None
+        self._loop = None
+
+    def publish(self, event: Dict[str, Any]) -> None:
+        self._call_in_loop(self._publish, event)
+
+    def invalidate(self, name: str) -> None:
+        """Сбросить кеш name во всех процессах"""
+        self._run_invalidation(name)
+        self._call_in_loop(self._forward, CHANNEL_INVALIDATE, {"name": name})
+
+    def _call_in_loop(self, callback: Callable, *args: Any) -> None:
+        loop = self._loop
+        if loop is None or loop.is_closed():
+            logger.debug("Сообщение шины пропущено: шина событий не запущена")
+            return
+
+        try:
+            running_loop = asyncio.get_running_loop()
+        except RuntimeError:
+            running_loop = None
+
+        if running_loop is loop:
+            callback(*args)
+        else:
+            loop.call_soon_threadsafe(callback, *args)
+
+    def _publish(self, event: Dict[str, Any]) -> None:
+        self._dispatch(event, local=True)
+        self._forward(CHANNEL_EVENTS, event)
+
+    def _forward(self, channel: str, payload: Dict[str, Any]) -> None:
+        if self._outbox is None:
+            return
+        try:
+            self._outbox.put_nowait({"origin": self._origin, "channel": channel, "payload": payload})
+        except asyncio.QueueFull:
+            self._lost = True
+            logger.warning("Очередь отправки шины переполнена, сообщение канала %s отброшено", channel)
+
+    def _receive(self, message: Dict[str, Any]) -> None:
+        if message.get("origin") == self._origin:
+            return
+        channel = message.get("channel")
+        if channel == CHANNEL_EVENTS:
+            self._dispatch(message["payload"], local=False)
+        elif channel == CHANNEL_INVALIDATE:
+            self._run_invalidation(message["payload"]["name"])
+        elif channel == CHANNEL_RESYNC:
+            logger.warning("Процесс-источник потерял сообщения шины, кеши сброшены")
+            self._resync()
+
+    def _resync(self) -> None:
+        """Транспорт мог потерять сообщения других процессов - сбрасываем все кеши процесса"""
+        for name in list(self._invalidation_handlers):
+            self._run_invalidation(name)
+
+    def _run_invalidation(self, name: str) -> None:
+        for handler in self._invalidation_handlers.get(name, []):
+            try:
+                handler()
+            except Exception:
+                logger.exception("Ошибка сброса кеша %s", name)
+
+    def _dispatch(self, event: Dict[str, Any], local: bool) -> None:
+        for subscriber in self._subscribers:
+            if subscriber.queue is None or (subscriber.local_only and not local):
+                continue
+            try:
+                subscriber.queue.put_nowait(event)
+            except asyncio.QueueFull:
+                logger.warning(
+                    "Очередь подписчика %s переполнена, событие %s отброшено",
+                    subscriber.name,
+                    event.get("type"),
+                )
+
+    async def _consume(self, subscriber: _Subscriber) -> None:
+        while True:
+            event = await subscriber.queue.get()
+            try:
+                await subscriber.handler(event)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Ошибка обработки события %s подписчиком %s", event.get("type"), subscriber.name)
+
+    async def _send_loop(self) -> None:
+        while True:
+            if self._lost:
+                # Не ждем новых сообщений: остальные процессы должны узнать о потере сразу
+                self._lost = False
+                batch = [{"origin": self._origin, "channel": CHANNEL_RESYNC, "payload": {}}]
+            else:
+                batch = [await self._outbox.get()]
+            while not self._outbox.empty() and len(batch) < 100:
+                batch.append(self._outbox.get_nowait())
+            if not await self._send(batch):
+                self._lost = True
+                logger.error(
+                    "Пачка из %d сообщений не отправлена в шину %s, остальные процессы будут пересинхронизированы",
+                    len(batch),
+                    self._backend.name,
+                )
+
+    async def _send(self, batch: List[Dict[str, Any]]) -> bool:
+        delay = SEND_RETRY_DELAY_SECONDS
+        for attempt in range(1, SEND_ATTEMPTS + 1):
+            try:
+                await self._backend.send(batch)
+                return True
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception(
+                    "Ошибка отправки %d сообщений в шину %s (попытка %d из %d)",
+                    len(batch),
+                    self._backend.name,
+                    attempt,
+                    SEND_ATTEMPTS,
+                )
+            if attempt < SEND_ATTEMPTS:
+                await asyncio.sleep(delay)
+                delay *= 2
+        return False
+
+event_bus = EventBus(create_bus_backend(settings.EVENT_BUS_BACKEND))
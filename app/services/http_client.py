@@ -0,0 +1,114 @@
+import asyncio
+import logging
+import time
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, Optional
+
+import httpx
+
+from app.config import settings
+from app.services.rate_limit import TokenBucket
+
+logger = logging.getLogger(__name__)
+
+
+class ProviderPaused(Exception):
+    """
+    Провайдер попросил подождать (429 Retry-After)
+
+    rejected=True - провайдер ответил 429 на этот запрос; False - провайдер на паузе после
+    более раннего 429, запрос не выполнялся.
+    """
+
+    def __init__(self, retry_after: float, rejected: bool = False) -> None:
+        super().__init__(f"retry after {retry_after:.1f}s")
+        self.retry_after = retry_after
+        self.rejected = rejected
+
+
+class _ProviderLimit:
+    def __init__(self) -> None:
+        # Лимиты HTTP_PROVIDER_* общие на приложение: каждый из WORKERS процессов
+        # отправляет уведомления сам и получает свою долю
+        workers = max(settings.WORKERS, 1)
+        self.semaphore = asyncio.Semaphore(max(settings.HTTP_PROVIDER_MAX_CONCURRENCY // workers, 1))
+        self.bucket = TokenBucket(
+            settings.HTTP_PROVIDER_RATE_PER_SECOND / workers,
+            settings.HTTP_PROVIDER_RATE_BURST / workers,
+        )
+        self.paused_until = 0.0
+
+
+class SharedHttpClient:
+    """
+    Общий httpx.AsyncClient для внешних API (уведомления)
+
+    Соединения переиспользуются между запросами (keep-alive), с провайдерами, которые его
+    поддерживают, используется HTTP/2 (httpx[http2] в requirements.txt). Запросы к одному
+    провайдеру ограничены по частоте (token bucket HTTP_PROVIDER_RATE_PER_SECOND /
+    HTTP_PROVIDER_RATE_BURST) и числу одновременных (HTTP_PROVIDER_MAX_CONCURRENCY):
+    всплеск растягивается во времени, а не упирается в 429. Лимиты заданы на все
+    приложение и делятся между WORKERS процессами.
+    После 429 провайдер ставится на паузу (pause), запросы на время паузы отклоняются сразу.
+    Создается при старте приложения и закрывается при остановке.
+    """
+
+    def __init__(self) -> None:
+        self._client: Optional[httpx.AsyncClient] = None
+        self._limits: Dict[str, _ProviderLimit] = {}
+
+    async def start(self) -> None:
+        self._client = httpx.AsyncClient(
+            http2=True,
+            timeout=settings.NOTIFICATION_TIMEOUT_SECONDS,
+            limits=httpx.Limits(
+                max_connections=settings.HTTP_MAX_CONNECTIONS,
+                max_keepalive_connections=settings.HTTP_MAX_KEEPALIVE_CONNECTIONS,
+                keepalive_expiry=settings.HTTP_KEEPALIVE_EXPIRY_SECONDS,
+            ),
+        )
+        logger.info("HTTP клиент запущен")
+
+    async def stop(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            raise RuntimeError("HTTP клиент не запущен")
+        return self._client
+
+    @asynccontextmanager
+    async def provider_slot(self, provider: str) -> AsyncIterator[httpx.AsyncClient]:
+        """Клиент для запроса к провайдеру с учетом паузы, частоты и числа одновременных запросов"""
+        limit = self._get_limit(provider)
+        paused_for = limit.paused_until - time.monotonic()
+        if paused_for > 0:
+            raise ProviderPaused(paused_for)
+        await limit.bucket.acquire()
+        async with limit.semaphore:
+            yield self.client
+
+    def pause(self, provider: str, seconds: float) -> None:
+        """Не отправлять запросы провайдеру seconds секунд (ответ 429 с Retry-After)"""
+        limit = self._get_limit(provider)
+        limit.paused_until = max(limit.paused_until, time.monotonic() + seconds)
+        logger.warning("Провайдер %s ограничил частоту запросов, пауза %.1fс", provider, seconds)
+
+    def get_provider_state(self, provider: str) -> Dict[str, Any]:
+        """Состояние ограничений провайдера в этом процессе"""
+        limit = self._limits.get(provider)
+        if limit is None:
+            return {"paused_for": 0.0}
+        return {"paused_for": round(max(limit.paused_until - time.monotonic(), 0.0), 1)}
+
+    def _get_limit(self, provider: str) -> _ProviderLimit:
+        limit = self._limits.get(provider)
+        if limit is None:
+            limit = self._limits[provider] = _ProviderLimit()
+        return limit
+
+
+http_client = SharedHttpClient()
@@ -0,0 +1,386 @@
+import asyncio
+import json
+import logging
+import random
+import time
+import uuid
+from typing import Any, Dict, List, Optional
+
+import anyio
+import httpx
+from sqlalchemy import or_
+from sqlalchemy.orm import aliased
+
+from app.config import settings
+from app.database import SessionLocal
+from app.models.notification_delivery import NotificationDelivery
+from app.models.notification_outbox import NotificationOutbox
+from app.services.auth import get_current_timestamp, get_timestamp_after
+from app.services.http_client import ProviderPaused
+from app.services.notifications import (
+    DAILY_SUMMARY_EVENT,
+    NotificationConfigError,
+    format_digest_message,
+    load_notifications_settings,
+    send_via_provider,
+)
+from app.services.scheduler import scheduler
+
+logger = logging.getLogger(__name__)
+
+# Максимум событий в одном сообщении сводки (ограничение длины сообщения у провайдеров)
+DIGEST_MAX_EVENTS = 30
+
+
+def retry_delay(attempts: int) -> float:
+    """Экспоненциальная задержка перед повтором с разбросом, чтобы повторы не шли пачкой"""
+    delay = min(
+        settings.NOTIFICATION_RETRY_BASE_SECONDS * (2 ** (attempts - 1)),
+        settings.NOTIFICATION_RETRY_MAX_SECONDS,
+    )
+    return delay * random.uniform(0.8, 1.2)
+
+
+def describe_error(exc: Exception) -> str:
+    if isinstance(exc, httpx.HTTPStatusError) and exc.response is not None:
+        return f"HTTP {exc.response.status_code}: {exc.response.text[:500]}"
+    return f"{type(exc).__name__}: {exc}"[:500]
+
+
+def group_for_sending(items: List[Dict[str, Any]], digest_window: int) -> List[List[Dict[str, Any]]]:
+    """
+    Разбить строки на сообщения: без окна сводки - по сообщению на строку, иначе события
+    одного провайдера (чата) объединяются, до DIGEST_MAX_EVENTS в сообщении
+    """
+    if digest_window <= 0:
+        return [[item] for item in items]
+
+    groups: List[List[Dict[str, Any]]] = []
+    by_provider: Dict[str, List[Dict[str, Any]]] = {}
+    for item in items:
+        if item["event_type"] == DAILY_SUMMARY_EVENT:
+            groups.append([item])
+            continue
+        group = by_provider.get(item["provider"])
+        if group is None or len(group) >= DIGEST_MAX_EVENTS:
+            group = by_provider[item["provider"]] = []
+            groups.append(group)
+        group.append(item)
+    return groups
+
+
+def defer_groups(
+    groups: List[List[Dict[str, Any]]],
+    next_attempt_at: str,
+    error: str,
+    delivery_status: Optional[str] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Отложить сообщения без расхода попытки; delivery_status пишется в журнал доставки
+    только для первого сообщения (того, что получило отказ)
+    """
+    results = [
+        {
+            **item,
+            "status": "pending",
+            "attempts": item["attempts"] - 1,
+            "error": error,
+            "next_attempt_at": next_attempt_at,
+        }
+        for group in groups
+        for item in group
+    ]
+    if delivery_status and results:
+        results[0].update(delivery_status=delivery_status, message_events=len(groups[0]))
+    return results
+
+
+def build_message_results(
+    group: List[Dict[str, Any]],
+    delivery_status: str,
+    latency_ms: Optional[int] = None,
+    **values: Any,
+) -> List[Dict[str, Any]]:
+    """
+    Новое состояние строк одного сообщения
+
+    Сообщение - один запрос к провайдеру, поэтому в журнал доставки оно пишется одной
+    строкой (у первой строки outbox) с числом событий в message_events.
+    """
+    results = [{**item, **values} for item in group]
+    results[0].update(delivery_status=delivery_status, latency_ms=latency_ms, message_events=len(group))
+    return results
+
+
+class NotificationOutboxWorker:
+    """
+    Фоновая доставка уведомлений из таблицы notification_outbox
+
+    Строки берутся в работу условным UPDATE (status, locked_by), поэтому несколько
+    воркеров uvicorn не отправят одно уведомление дважды. Неудачные попытки повторяются
+    с экспоненциальной задержкой; после NOTIFICATION_MAX_ATTEMPTS строка получает статус
+    dead и больше не отправляется. Строки, зависшие в processing (процесс упал во время
+    отправки), возвращаются в работу через NOTIFICATION_LOCK_TIMEOUT_SECONDS.
+
+    В режиме сводки (digest_window_seconds) строки одного провайдера отправляются одним
+    сообщением, результат попытки применяется ко всем строкам сообщения.
+
+    Сообщения одного провайдера (чата) отправляются последовательно в порядке создания,
+    разные провайдеры - параллельно. Если провайдер ответил 429 или сообщение ушло на
+    повтор после ошибки, оставшиеся сообщения откладываются до конца паузы (до повтора)
+    без расхода попыток и затем уходят в том же порядке; более новые строки провайдера
+    не берутся в работу, пока ожидает повтора более старая.
+
+    Каждая попытка отправки пишется в notification_deliveries (статус и время ответа
+    провайдера) в той же транзакции, что и новое состояние строки outbox.
+    """
+
+    def __init__(self) -> None:
+        self.worker_id = uuid.uuid4().hex
+        self._task: Optional[asyncio.Task] = None
+        self._wake = asyncio.Event()
+
+    async def start(self) -> None:
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    def wake(self) -> None:
+        """Разбудить обработчик сразу после коммита новых строк, не дожидаясь опроса"""
+        self._wake.set()
+
+    async def _run(self) -> None:
+        while True:
+            self._wake.clear()
+            try:
+                processed = await self.process_batch()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Ошибка обработки outbox уведомлений")
+                processed = 0
+
+            if processed >= settings.NOTIFICATION_OUTBOX_BATCH_SIZE:
+                continue
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=settings.NOTIFICATION_OUTBOX_POLL_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+
+    async def process_batch(self) -> int:
+        """Взять пачку строк и отправить: провайдеры параллельно, сообщения провайдера по очереди"""
+        items = await anyio.to_thread.run_sync(self._claim)
+        if not items:
+            return 0
+
+        notifications = await anyio.to_thread.run_sync(load_notifications_settings)
+        groups = group_for_sending(items, notifications.get("digest_window_seconds") or 0)
+        by_provider: Dict[str, List[List[Dict[str, Any]]]] = {}
+        for group in groups:
+            by_provider.setdefault(group[0]["provider"], []).append(group)
+        results = await asyncio.gather(
+            *(self._send_in_order(provider_groups, notifications) for provider_groups in by_provider.values())
+        )
+        await anyio.to_thread.run_sync(self._record, [result for provider in results for result in provider])
+        return len(items)
+
+    async def _send_in_order(
+        self,
+        groups: List[List[Dict[str, Any]]],
+        notifications: Dict[str, Any],
+    ) -> List[Dict[str, Any]]:
+        results: List[Dict[str, Any]] = []
+        for index, group in enumerate(groups):
+            try:
+                sent = await self._send(group, notifications)
+            except ProviderPaused as exc:
+                # Провайдер на паузе: это и следующие сообщения ждут ее окончания.
+                # В журнал доставки попадает только сообщение, получившее 429 от провайдера,
+                # а не отложенное из-за паузы без запроса
+                if exc.rejected:
+                    error, delivery_status = f"429, повтор через {exc.retry_after:.1f}с", "rate_limited"
+                else:
+                    error, delivery_status = f"провайдер на паузе, повтор через {exc.retry_after:.1f}с", None
+                results.extend(defer_groups(
+                    groups[index:],
+                    get_timestamp_after(exc.retry_after),
+                    error,
+                    delivery_status=delivery_status,
+                ))
+                break
+            results.extend(sent)
+            if sent[0]["status"] == "pending":
+                # Сообщение будет повторено: следующие ждут его, чтобы не обогнать
+                results.extend(defer_groups(
+                    groups[index + 1:],
+                    sent[0]["next_attempt_at"],
+                    "ожидает повтора предыдущего сообщения",
+                ))
+                break
+        return results
+
+    def _claim(self) -> List[Dict[str, Any]]:
+        """Взять в работу готовые к отправке строки (и зависшие в processing)"""
+        now = get_current_timestamp()
+        stale_before = get_timestamp_after(-settings.NOTIFICATION_LOCK_TIMEOUT_SECONDS)
+        # Более старая строка того же провайдера ждет повтора после ошибки
+        waiting = aliased(NotificationOutbox)
+        db = SessionLocal()
+        try:
+            waiting_for_retry = db.query(waiting.id).filter(
+                waiting.provider == NotificationOutbox.provider,
+                waiting.status == "pending",
+                waiting.attempts > 0,
+                waiting.next_attempt_at > now,
+                waiting.created_at < NotificationOutbox.created_at,
+            ).exists()
+            candidates = db.query(NotificationOutbox).filter(
+                or_(
+                    (NotificationOutbox.status == "pending") & (NotificationOutbox.next_attempt_at <= now),
+                    (NotificationOutbox.status == "processing") & (NotificationOutbox.locked_at < stale_before),
+                ),
+                ~waiting_for_retry,
+            ).order_by(NotificationOutbox.created_at).limit(settings.NOTIFICATION_OUTBOX_BATCH_SIZE).all()
+
+            claimed = []
+            for item in candidates:
+                updated = db.query(NotificationOutbox).filter(
+                    NotificationOutbox.id == item.id,
+                    NotificationOutbox.status == item.status,
+                ).update(
+                    {"status": "processing", "locked_by": self.worker_id, "locked_at": now, "updated_at": now},
+                    synchronize_session=False,
+                )
+                if updated:
+                    claimed.append({
+                        "id": item.id,
+                        "event_type": item.event_type,
+                        "payload": item.payload,
+                        "provider": item.provider,
+                        "attempts": item.attempts + 1,
+                    })
+            db.commit()
+            return claimed
+        finally:
+            db.close()
+
+    async def _send(self, group: List[Dict[str, Any]], notifications: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """
+        Одна попытка отправки сообщения; результат - новое состояние строк сообщения
+
+        ProviderPaused пробрасывается: откладывание решает _send_in_order.
+        """
+        provider = group[0]["provider"]
+        event_type = group[0]["event_type"] if len(group) == 1 else f"сводка из {len(group)}"
+        attempts = max(item["attempts"] for item in group)
+        started = time.monotonic()
+        try:
+            message = format_digest_message([(item["event_type"], json.loads(item["payload"])) for item in group])
+            await send_via_provider(provider, notifications, message)
+        except ProviderPaused:
+            raise
+        except NotificationConfigError as exc:
+            logger.warning("Уведомление %s через %s не отправлено: %s", event_type, provider, exc)
+            return build_message_results(group, "dead", status="dead", error=str(exc))
+        except Exception as exc:
+            latency_ms = int((time.monotonic() - started) * 1000)
+            error = describe_error(exc)
+            if attempts >= settings.NOTIFICATION_MAX_ATTEMPTS:
+                logger.error(
+                    "Уведомление %s через %s не доставлено после %d попыток: %s",
+                    event_type,
+                    provider,
+                    attempts,
+                    error,
+                )
+                return build_message_results(group, "dead", latency_ms, status="dead", error=error)
+
+            delay = retry_delay(attempts)
+            logger.warning(
+                "Ошибка отправки уведомления через %s (попытка %d), повтор через %.1fс: %s",
+                provider,
+                attempts,
+                delay,
+                error,
+            )
+            return build_message_results(
+                group,
+                "failed",
+                latency_ms,
+                status="pending",
+                error=error,
+                next_attempt_at=get_timestamp_after(delay),
+            )
+        latency_ms = int((time.monotonic() - started) * 1000)
+        return build_message_results(group, "sent", latency_ms, status="sent", error=None)
+
+    def _record(self, results: List[Dict[str, Any]]) -> None:
+        """Сохранить результаты попыток и журнал доставки одной транзакцией"""
+        now = get_current_timestamp()
+        db = SessionLocal()
+        try:
+            for result in results:
+                values = {
+                    "status": result["status"],
+                    "attempts": result["attempts"],
+                    "last_error": result["error"],
+                    "locked_by": None,
+                    "locked_at": None,
+                    "updated_at": now,
+                }
+                if result["status"] == "sent":
+                    values["sent_at"] = now
+                if "next_attempt_at" in result:
+                    values["next_attempt_at"] = result["next_attempt_at"]
+                db.query(NotificationOutbox).filter(
+                    NotificationOutbox.id == result["id"],
+                    NotificationOutbox.locked_by == self.worker_id,
+                ).update(values, synchronize_session=False)
+                if "delivery_status" in result:
+                    db.add(NotificationDelivery(
+                        outbox_id=result["id"],
+                        event_type=result["event_type"],
+                        provider=result["provider"],
+                        attempt=result["attempts"],
+                        events=result.get("message_events", 1),
+                        status=result["delivery_status"],
+                        latency_ms=result.get("latency_ms"),
+                        error=result["error"],
+                        created_at=now,
+                    ))
+            db.commit()
+        finally:
+            db.close()
+
+
+notification_outbox = NotificationOutboxWorker()
+
+
+def prune_notification_history() -> None:
+    """Удалить журнал доставки и отправленные/dead строки outbox старше NOTIFICATION_HISTORY_RETENTION_DAYS"""
+    before = get_timestamp_after(-settings.NOTIFICATION_HISTORY_RETENTION_DAYS * 86400)
+    db = SessionLocal()
+    try:
+        deliveries = db.query(NotificationDelivery).filter(
+            NotificationDelivery.created_at < before
+        ).delete(synchronize_session=False)
+        outbox = db.query(NotificationOutbox).filter(
+            NotificationOutbox.status.in_(["sent", "dead"]),
+            NotificationOutbox.updated_at < before,
+        ).delete(synchronize_session=False)
+        db.commit()
+        if deliveries or outbox:
+            logger.info("Удалено записей журнала доставки: %d, строк outbox: %d", deliveries, outbox)
+    finally:
+        db.close()
+
+
+scheduler.add_interval(
+    "notification_history_prune",
+    settings.NOTIFICATION_HISTORY_PRUNE_INTERVAL_SECONDS,
+    prune_notification_history,
+)
@@ -0,0 +1,145 @@
+import hashlib
+import hmac
+import json
+from typing import Any, Dict, List, Optional, Tuple, Type
+
+import httpx
+from pydantic import BaseModel
+
+from app.config import settings
+from app.services.http_client import ProviderPaused, http_client
+
+
+class NotificationProvider:
+    """
+    Провайдер уведомлений
+
+    Объявляет код, схему настроек (settings_model - попадает в NotificationProviders
+    в app/schemas/setting.py), обязательные при включении поля и асинхронную отправку.
+    Новый провайдер подключается register_provider() в этом модуле.
+    """
+
+    code: str
+    title: str
+    settings_model: Type[BaseModel]
+    required_fields: Tuple[str, ...] = ()
+
+    def get_missing_fields(self, config: Dict[str, Any]) -> List[str]:
+        return [field for field in self.required_fields if not config.get(field)]
+
+    def get_timeout(self, config: Dict[str, Any]) -> float:
+        return config.get("timeout_seconds") or settings.NOTIFICATION_TIMEOUT_SECONDS
+
+    async def send(self, config: Dict[str, Any], message: str) -> None:
+        raise NotImplementedError
+
+    async def post(self, config: Dict[str, Any], url: str, **kwargs: Any) -> httpx.Response:
+        """POST через общий клиент с лимитами провайдера и его таймаутом"""
+        async with http_client.provider_slot(self.code) as client:
+            response = await client.post(url, timeout=self.get_timeout(config), **kwargs)
+        self.raise_for_status(response)
+        return response
+
+    def raise_for_status(self, response: httpx.Response) -> None:
+        """Ошибка ответа провайдера; на 429 провайдер ставится на паузу и бросается ProviderPaused"""
+        if response.status_code == 429:
+            retry_after = get_retry_after(response)
+            http_client.pause(self.code, retry_after)
+            raise ProviderPaused(retry_after, rejected=True)
+        response.raise_for_status()
+
+
+def get_retry_after(response: httpx.Response) -> float:
+    """Сколько ждать после 429: parameters.retry_after (Telegram) или заголовок Retry-After"""
+    try:
+        retry_after = (response.json().get("parameters") or {}).get("retry_after")
+    except (ValueError, AttributeError):
+        retry_after = None
+    if retry_after is None:
+        retry_after = response.headers.get("Retry-After")
+    try:
+        return max(float(retry_after), 1.0)
+    except (TypeError, ValueError):
+        return settings.NOTIFICATION_RETRY_BASE_SECONDS
+
+
+class MaxViaGreenApiSettings(BaseModel):
+    enabled: bool = False
+    base_url: Optional[str] = None
+    instance_id: Optional[str] = None
+    api_token: Optional[str] = None
+    chat_id: Optional[str] = None
+
+
+class MaxViaGreenApiProvider(NotificationProvider):
+    code = "max_via_green_api"
+    title = "MAX (Green API)"
+    settings_model = MaxViaGreenApiSettings
+    required_fields = ("base_url", "instance_id", "api_token", "chat_id")
+
+    async def send(self, config: Dict[str, Any], message: str) -> None:
+        url = f"{config['base_url'].rstrip('/')}/waInstance{config['instance_id']}/sendMessage/{config['api_token']}"
+        payload = {
+            "chatId": config["chat_id"],
+            "message": message,
+        }
+        await self.post(config, url, json=payload, headers={"Content-Type": "application/json"})
+
+
+class TelegramSettings(BaseModel):
+    enabled: bool = False
+    bot_token: Optional[str] = None
+    chat_id: Optional[str] = None
+
+
+class TelegramProvider(NotificationProvider):
+    code = "telegram"
+    title = "Telegram"
+    settings_model = TelegramSettings
+    required_fields = ("bot_token", "chat_id")
+
+    async def send(self, config: Dict[str, Any], message: str) -> None:
+        url = f"{settings.TELEGRAM_API_BASE_URL.rstrip('/')}/bot{config['bot_token']}/sendMessage"
+        payload = {
+            "chat_id": config["chat_id"],
+            "text": message,
+            "disable_web_page_preview": True,
+        }
+        await self.post(config, url, json=payload)
+
+
+class WebhookSettings(BaseModel):
+    enabled: bool = False
+    url: Optional[str] = None
+    secret: Optional[str] = None  # Подпись тела: X-Signature: sha256=<HMAC-SHA256>
+    timeout_seconds: Optional[float] = None
+
+
+class WebhookProvider(NotificationProvider):
+    """POST {"text": ...} на произвольный адрес (например, SIEM)"""
+
+    code = "webhook"
+    title = "Webhook"
+    settings_model = WebhookSettings
+    required_fields = ("url",)
+
+    async def send(self, config: Dict[str, Any], message: str) -> None:
+        body = json.dumps({"text": message}, ensure_ascii=False).encode("utf-8")
+        headers = {"Content-Type": "application/json"}
+        if config.get("secret"):
+            signature = hmac.new(config["secret"].encode("utf-8"), body, hashlib.sha256).hexdigest()
+            headers["X-Signature"] = f"sha256={signature}"
+        await self.post(config, config["url"], content=body, headers=headers)
+
+
+NOTIFICATION_PROVIDERS: Dict[str, NotificationProvider] = {}
+
+
+def register_provider(provider: NotificationProvider) -> NotificationProvider:
+    NOTIFICATION_PROVIDERS[provider.code] = provider
+    return provider
+
+
+register_provider(MaxViaGreenApiProvider())
+register_provider(TelegramProvider())
+register_provider(WebhookProvider())
@@ -1,34 +1,32 @@
 import json
 import logging
-from typing import Any, Dict
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
 
-import httpx
+from sqlalchemy import func
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
 
 from app.database import SessionLocal
-from app.models.setting import Setting
+from app.models.entry import Entry
+from app.models.notification_outbox import NotificationOutbox
 from app.schemas.setting import NOTIFICATION_TYPES
-from app.services.settings import build_default_notifications, normalize_notifications
+from app.services.auth import get_current_timestamp, get_timestamp_after
+from app.services.notification_providers import NOTIFICATION_PROVIDERS
+from app.services.scheduler import scheduler
+from app.services.settings import settings_cache
+from app.services.workdays import format_date, get_next_workday
 
 
 logger = logging.getLogger(__name__)
 
+# Тип события ежедневной сводки (не входит в NOTIFICATION_TYPES - включается отдельной настройкой)
+DAILY_SUMMARY_EVENT = "daily_summary"
 
-def load_notifications_settings() -> Dict[str, Any]:
-    db = SessionLocal()
-    try:
-        record = db.query(Setting).filter(Setting.key == "notifications").first()
-        if not record or not record.value:
-            return build_default_notifications()
 
-        try:
-            value = record.value
-            notifications = normalize_notifications(json.loads(value))
-            return notifications
-        except Exception:
-            logger.exception("Не удалось распарсить настройки notifications")
-            return build_default_notifications()
-    finally:
-        db.close()
+def load_notifications_settings(db: Optional[Session] = None) -> Dict[str, Any]:
+    """Настройки уведомлений из кеша (запрос к БД - только после их изменения)"""
+    return settings_cache.get(db)["notifications"]
 
 
 def should_send_notification(event_type: str, notifications: Dict[str, Any]) -> bool:
@@ -44,6 +42,9 @@ def get_notification_title(event_type: str) -> str:
 
 
 def format_notification_message(event_type: str, payload: Dict[str, Any]) -> str:
+    if event_type == DAILY_SUMMARY_EVENT:
+        return format_daily_summary(payload)
+
     title = get_notification_title(event_type)
     lines = [f"*{title}*"]
 
@@ -66,77 +67,162 @@ def format_notification_message(event_type: str, payload: Dict[str, Any]) -> str
     return "\n".join(lines)
 
 
-def send_max_via_green_api(base_url: str, instance_id: str, api_token: str, chat_id: str, message: str) -> None:
-    url = f"{base_url.rstrip('/')}/waInstance{instance_id}/sendMessage/{api_token}"
-    payload = {
-        "chatId": chat_id,
-        "message": message,
-    }
-    headers = {"Content-Type": "application/json"}
+def format_digest_message(events: List[Tuple[str, Dict[str, Any]]]) -> str:
+    """Несколько событий одним сообщением: заголовок и события через пустую строку"""
+    if len(events) == 1:
+        return format_notification_message(*events[0])
+    parts = [f"*Изменения: {len(events)}*"]
+    parts.extend(format_notification_message(event_type, payload) for event_type, payload in events)
+    return "\n\n".join(parts)
+
+
+def format_daily_summary(payload: Dict[str, Any]) -> str:
+    entries = payload.get("entries") or []
+    lines = [f"*Гости на {payload.get('date')}: {len(entries)}*"]
+    if not entries:
+        lines.append("Гостей нет")
+    for entry in entries:
+        line = f"{entry.get('time')} {entry.get('name')}"
+        if entry.get("responsible"):
+            line += f" (Ответственный: {entry.get('responsible')})"
+        lines.append(line)
+    return "\n".join(lines)
+
+
+class NotificationConfigError(Exception):
+    """Провайдер отключен или не настроен - повторять отправку бессмысленно"""
+
+
+async def send_via_provider(provider: str, notifications: Dict[str, Any], message: str) -> None:
+    """Отправка через провайдера по текущим настройкам; ошибки отправки пробрасываются"""
+    plugin = NOTIFICATION_PROVIDERS.get(provider)
+    if plugin is None:
+        raise NotificationConfigError(f"Неизвестный провайдер {provider}")
+
+    config = (notifications.get("providers") or {}).get(provider) or {}
+    if not config.get("enabled"):
+        raise NotificationConfigError(f"{provider} отключен")
+    missing_fields = plugin.get_missing_fields(config)
+    if missing_fields:
+        raise NotificationConfigError(f"{provider} включен, но {'/'.join(missing_fields)} отсутствуют")
+
+    await plugin.send(config, message)
+
+
+def enqueue_notifications(db: Session, event_type: str, payload: Dict[str, Any]) -> None:
+    """
+    Поставить уведомления о событии в outbox - по строке на каждый включенный провайдер
+
+    Строки добавляются в сессию вызывающего и фиксируются его commit вместе с изменением
+    записи; отправку выполняет фоновый обработчик (app/services/notification_outbox.py).
+    """
+    notifications = load_notifications_settings(db)
+    if not should_send_notification(event_type, notifications):
+        return
+
+    timestamp = get_current_timestamp()
+    digest_window = notifications.get("digest_window_seconds") or 0
+    for provider in get_enabled_providers(notifications):
+        next_attempt_at = timestamp
+        if digest_window > 0:
+            next_attempt_at = get_digest_send_time(db, provider, timestamp, digest_window)
+        db.add(NotificationOutbox(
+            event_type=event_type,
+            payload=json.dumps(payload, ensure_ascii=False),
+            provider=provider,
+            status="pending",
+            attempts=0,
+            next_attempt_at=next_attempt_at,
+            created_at=timestamp,
+        ))
+
+
+def get_enabled_providers(notifications: Dict[str, Any]) -> List[str]:
+    providers = notifications.get("providers") or {}
+    return [provider for provider, config in providers.items() if (config or {}).get("enabled")]
+
+
+def get_digest_send_time(db: Session, provider: str, timestamp: str, digest_window: int) -> str:
+    """
+    Время отправки события в режиме сводки: если окно для чата провайдера уже открыто
+    (есть ожидающее событие), присоединяемся к нему, иначе открываем новое окно
+    """
+    window_end = db.query(func.min(NotificationOutbox.next_attempt_at)).filter(
+        NotificationOutbox.provider == provider,
+        NotificationOutbox.status == "pending",
+        NotificationOutbox.attempts == 0,
+        NotificationOutbox.event_type != DAILY_SUMMARY_EVENT,
+        NotificationOutbox.next_attempt_at > timestamp,
+    ).scalar()
+    return window_end or get_timestamp_after(digest_window)
+
+
+def get_daily_summary_time() -> Optional[str]:
+    """Время ежедневной сводки (HH:MM) или None, если она отключена"""
+    notifications = load_notifications_settings()
+    if not notifications.get("daily_summary_enabled") or not get_enabled_providers(notifications):
+        return None
     try:
-        response = httpx.post(url, json=payload, headers=headers, timeout=10)
-        response.raise_for_status()
-    except httpx.HTTPStatusError as exc:
-        response_text = exc.response.text if exc.response is not None else ""
-        logger.error(
-            "Ошибка отправки уведомления через max_via_green_api: %s",
-            response_text,
-            exc_info=True,
-        )
-    except Exception:
-        logger.exception("Ошибка отправки уведомления через max_via_green_api")
-
-
-def send_telegram(bot_token: str, chat_id: str, message: str) -> None:
-    url = f"https://api.telegram.org/bot{bot_token}/sendMessage"
-    payload = {
-        "chat_id": chat_id,
-        "text": message,
-        "disable_web_page_preview": True,
+        return datetime.strptime(notifications.get("daily_summary_time") or "", "%H:%M").strftime("%H:%M")
+    except ValueError:
+        logger.warning("Некорректное daily_summary_time: %s", notifications.get("daily_summary_time"))
+        return None
+
+
+def build_daily_summary(db: Session, date_key: str) -> Dict[str, Any]:
+    """Гости на дату (одним запросом): без удаленных и отмененных, по времени"""
+    entries = db.query(Entry.name, Entry.responsible, Entry.datetime).filter(
+        Entry.datetime >= f"{date_key}T00:00:00",
+        Entry.datetime <= f"{date_key}T23:59:59",
+        Entry.deleted_at.is_(None),
+        Entry.is_cancelled == 0,
+    ).order_by(Entry.datetime).all()
+    return {
+        "date": datetime.strptime(date_key, "%Y-%m-%d").strftime("%d.%m.%Y"),
+        "entries": [
+            {"name": name, "responsible": responsible, "time": entry_datetime[11:16]}
+            for name, responsible, entry_datetime in entries
+        ],
     }
+
+
+def enqueue_daily_summary(day_key: str) -> None:
+    """
+    Поставить в outbox сводку гостей следующего рабочего дня
+
+    dedupe_key (сводка + дата + провайдер) не дает поставить ее дважды - при нескольких
+    воркерах или повторном запуске после перезагрузки.
+    """
+    notifications = load_notifications_settings()
+    target_date = format_date(get_next_workday(datetime.strptime(day_key, "%Y-%m-%d")))
+    timestamp = get_current_timestamp()
+
+    db = SessionLocal()
     try:
-        response = httpx.post(url, json=payload, timeout=10)
-        response.raise_for_status()
-    except httpx.HTTPStatusError as exc:
-        response_text = exc.response.text if exc.response is not None else ""
-        logger.error(
-            "Ошибка отправки уведомления через telegram: %s",
-            response_text,
-            exc_info=True,
-        )
-    except Exception:
-        logger.exception("Ошибка отправки уведомления через telegram")
-
-
-def send_notifications_for_event(event_type: str, payload: Dict[str, Any]) -> None:
-    try:
-        notifications = load_notifications_settings()
-        if not should_send_notification(event_type, notifications):
+        payload = build_daily_summary(db, target_date)
+        for provider in get_enabled_providers(notifications):
+            dedupe_key = f"{DAILY_SUMMARY_EVENT}:{target_date}:{provider}"
+            if db.query(NotificationOutbox.id).filter(NotificationOutbox.dedupe_key == dedupe_key).first():
+                continue
+            db.add(NotificationOutbox(
+                event_type=DAILY_SUMMARY_EVENT,
+                payload=json.dumps(payload, ensure_ascii=False),
+                provider=provider,
+                dedupe_key=dedupe_key,
+                status="pending",
+                attempts=0,
+                next_attempt_at=timestamp,
+                created_at=timestamp,
+            ))
+        try:
+            db.commit()
+        except IntegrityError:
+            # Другой воркер поставил сводку одновременно с нами
+            db.rollback()
             return
+        logger.info("Сводка гостей на %s поставлена в очередь", target_date)
+    finally:
+        db.close()
+
 
-        providers = notifications.get("providers") or {}
-        message = format_notification_message(event_type, payload)
-
-        max_provider = providers.get("max_via_green_api") or {}
-        if max_provider.get("enabled"):
-            base_url = max_provider.get("base_url")
-            instance_id = max_provider.get("instance_id")
-            api_token = max_provider.get("api_token")
-            chat_id = max_provider.get("chat_id")
-            if base_url and instance_id and api_token and chat_id:
-                send_max_via_green_api(base_url, instance_id, api_token, chat_id, message)
-            else:
-                logger.warning(
-                    "max_via_green_api включен, но base_url/instance_id/api_token/chat_id отсутствуют"
-                )
-
-        telegram_provider = providers.get("telegram") or {}
-        if telegram_provider.get("enabled"):
-            bot_token = telegram_provider.get("bot_token")
-            chat_id = telegram_provider.get("chat_id")
-            if bot_token and chat_id:
-                send_telegram(bot_token, chat_id, message)
-            else:
-                logger.warning("telegram включен, но bot_token/chat_id отсутствуют")
-    except Exception:
-        logger.exception("Ошибка при отправке уведомлений")
+scheduler.add_daily(DAILY_SUMMARY_EVENT, get_daily_summary_time, enqueue_daily_summary)
@@ -0,0 +1,156 @@
+import logging
+import multiprocessing
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor, TimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from functools import lru_cache
+from typing import Any, Callable, Optional, Tuple
+
+from passlib.context import CryptContext
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class PasswordHasherBusy(Exception):
+    """Пул хеширования паролей занят (очередь заполнена или истек таймаут) - ответ 503"""
+
+    def __init__(self, retry_after: float = 1.0) -> None:
+        super().__init__(f"retry after {retry_after:.1f}s")
+        self.retry_after = retry_after
+
+
+ArgonParams = Tuple[int, int, int]
+
+
+@lru_cache(maxsize=4)
+def _get_context(params: ArgonParams) -> CryptContext:
+    time_cost, memory_cost, parallelism = params
+    return CryptContext(
+        schemes=["argon2"],
+        deprecated="auto",
+        argon2__rounds=time_cost,
+        argon2__memory_cost=memory_cost,
+        argon2__parallelism=parallelism,
+    )
+
+
+# Выполняются в процессах пула: параметры argon2 передаются явно, процесс не читает настройки
+def _hash(params: ArgonParams, secret: str) -> str:
+    return _get_context(params).hash(secret)
+
+
+def _verify(params: ArgonParams, secret: str, hashed: str) -> bool:
+    return _get_context(params).verify(secret, hashed)
+
+
+def _verify_and_update(params: ArgonParams, secret: str, hashed: str) -> Tuple[bool, Optional[str]]:
+    return _get_context(params).verify_and_update(secret, hashed)
+
+
+class PasswordHasherPool:
+    """
+    Argon2 в отдельном пуле процессов
+
+    Хеширование паролей занимает CPU на сотни миллисекунд, поэтому выполняется в
+    PASSWORD_HASH_WORKERS процессах (spawn), а не в потоках обработчиков запросов: всплеск
+    логинов загружает не больше этого числа ядер и не занимает все потоки API. Ждать
+    своей очереди могут еще PASSWORD_HASH_QUEUE_SIZE операций - следующие сразу получают
+    PasswordHasherBusy, как и операции, не уложившиеся в PASSWORD_HASH_TIMEOUT_SECONDS.
+    Если процесс пула погиб (OOM, сбой), пул пересоздается и операция повторяется один раз.
+    Пул создается при старте приложения (или при первом обращении - в скриптах) и
+    закрывается при остановке.
+    """
+
+    def __init__(self, workers: int, queue_size: int, timeout: float, params: ArgonParams) -> None:
+        self._workers = workers
+        self._timeout = timeout
+        self._params = params
+        self._slots = threading.BoundedSemaphore(workers + queue_size)
+        self._lock = threading.Lock()
+        self._executor: Optional[ProcessPoolExecutor] = None
+
+    def start(self) -> None:
+        self._get_executor()
+
+    def stop(self) -> None:
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self._workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+                logger.info("Пул хеширования паролей запущен (процессов: %d)", self._workers)
+            return self._executor
+
+    def _reset(self, broken: ProcessPoolExecutor) -> None:
+        """Заменить сломанный пул: следующая операция создаст новый"""
+        with self._lock:
+            if self._executor is not broken:
+                # Уже пересоздан другим потоком
+                return
+            self._executor = None
+        broken.shutdown(wait=False, cancel_futures=True)
+
+    def _run(self, fn: Callable[..., Any], *args: Any) -> Any:
+        try:
+            return self._submit(fn, *args)
+        except BrokenProcessPool:
+            logger.warning("Процесс пула хеширования паролей завершился аварийно, пул пересоздан")
+        try:
+            return self._submit(fn, *args)
+        except BrokenProcessPool:
+            logger.error("Пул хеширования паролей не работает после пересоздания")
+            raise PasswordHasherBusy()
+
+    def _submit(self, fn: Callable[..., Any], *args: Any) -> Any:
+        if not self._slots.acquire(blocking=False):
+            logger.warning("Очередь хеширования паролей заполнена")
+            raise PasswordHasherBusy()
+
+        executor = self._get_executor()
+        try:
+            future: Future = executor.submit(fn, self._params, *args)
+        except BaseException as exc:
+            self._slots.release()
+            if isinstance(exc, BrokenProcessPool):
+                self._reset(executor)
+            raise
+        # Слот освобождается, когда процесс закончил работу, а не когда истек таймаут
+        # ожидающего: иначе зависшие операции копились бы сверх лимита
+        future.add_done_callback(lambda _: self._slots.release())
+
+        try:
+            return future.result(timeout=self._timeout)
+        except TimeoutError:
+            future.cancel()
+            logger.warning("Хеширование пароля не уложилось в %.1f с", self._timeout)
+            raise PasswordHasherBusy()
+        except BrokenProcessPool:
+            self._reset(executor)
+            raise
+
+    def hash(self, secret: str) -> str:
+        return self._run(_hash, secret)
+
+    def verify(self, secret: str, hashed: str) -> bool:
+        return self._run(_verify, secret, hashed)
+
+    def verify_and_update(self, secret: str, hashed: str) -> Tuple[bool, Optional[str]]:
+        """(верен ли пароль, новый хеш или None) - новый хеш, если хеш создан с другими параметрами argon2"""
+        return self._run(_verify_and_update, secret, hashed)
+
+
+password_hasher = PasswordHasherPool(
+    workers=settings.PASSWORD_HASH_WORKERS,
+    queue_size=settings.PASSWORD_HASH_QUEUE_SIZE,
+    timeout=settings.PASSWORD_HASH_TIMEOUT_SECONDS,
+    params=(settings.ARGON2_TIME_COST, settings.ARGON2_MEMORY_COST, settings.ARGON2_PARALLELISM),
+)
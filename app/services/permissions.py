@@ -0,0 +1,153 @@
+import logging
+from dataclasses import dataclass
+from typing import Any, Dict, FrozenSet, Optional, Tuple, Union
+
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.models.permission import Permission
+from app.models.role import Role
+from app.models.role_permission import RolePermission
+from app.models.user import User
+from app.services.cache import VersionedCache
+from app.services.principals import Principal
+
+logger = logging.getLogger(__name__)
+
+ROLE_PERMISSIONS_CACHE = "role_permissions"
+
+# Известные права. Позиция в кортеже - номер бита в claim "perm" access token,
+# поэтому новые права добавляются только в конец.
+PERMISSION_CODES: Tuple[str, ...] = (
+    # Бэкенд-права
+    "can_view", "can_add", "can_edit_entry", "can_delete_entry",
+    "can_mark_completed", "can_unmark_completed", "can_move_entry",
+    "can_mark_cancelled", "can_unmark_cancelled",
+    "can_mark_pass", "can_revoke_pass",
+    # Фронтенд-права
+    "can_move_ui", "can_mark_completed_ui", "can_unmark_completed_ui",
+    "can_edit_entry_ui", "can_delete_ui",
+    "can_mark_cancelled_ui", "can_unmark_cancelled_ui",
+    "can_mark_pass_ui", "can_revoke_pass_ui",
+)
+PERMISSION_BITS: Dict[str, int] = {code: 1 << index for index, code in enumerate(PERMISSION_CODES)}
+
+# Админ имеет все права (бэкенд + фронтенд)
+ADMIN_PERMISSIONS: FrozenSet[str] = frozenset(PERMISSION_CODES)
+
+
+@dataclass(frozen=True)
+class RoleAccess:
+    version: int
+    permissions: FrozenSet[str]
+
+
+def load_role_permissions(db: Session) -> Dict[str, RoleAccess]:
+    """Версии и права всех ролей (два запроса): role_id -> RoleAccess"""
+    permissions: Dict[str, set] = {}
+    rows = db.query(RolePermission.role_id, Permission.code).join(
+        Permission, Permission.id == RolePermission.permission_id
+    ).all()
+    for role_id, code in rows:
+        permissions.setdefault(role_id, set()).add(code)
+    return {
+        role_id: RoleAccess(version or 1, frozenset(permissions.get(role_id, ())))
+        for role_id, version in db.query(Role.id, Role.version).all()
+    }
+
+
+class RolePermissionCache(VersionedCache[None, Dict[str, RoleAccess]]):
+    """
+    Права и версии ролей в памяти процесса
+
+    Загружаются из БД целиком одним запросом и до изменения: create_role/update_role/
+    delete_role после коммита вызывают event_bus.invalidate(ROLE_PERMISSIONS_CACHE).
+    Изменения прав в БД в обход API (миграции, ручные правки) подхватываются через
+    PERMISSION_CACHE_TTL_SECONDS.
+    """
+
+    def __init__(self) -> None:
+        super().__init__(ROLE_PERMISSIONS_CACHE, settings.PERMISSION_CACHE_TTL_SECONDS)
+
+    def load(self, db: Session, key: None) -> Dict[str, RoleAccess]:
+        return load_role_permissions(db)
+
+    def get(self, role_id: str, db: Optional[Session] = None) -> FrozenSet[str]:
+        access = self.get_value(None, db).get(role_id)
+        return access.permissions if access is not None else frozenset()
+
+    def get_version(self, role_id: str) -> Optional[int]:
+        access = self.get_value(None).get(role_id)
+        return access.version if access is not None else None
+
+
+role_permission_cache = RolePermissionCache()
+
+
+def get_user_permissions(user: Union[User, Principal]) -> FrozenSet[str]:
+    """Получить набор прав пользователя (коды прав) - все права (бэкенд + фронтенд)"""
+    if user.is_admin:
+        return ADMIN_PERMISSIONS
+
+    if not user.role_id:
+        return frozenset()
+
+    return role_permission_cache.get(user.role_id)
+
+
+def get_user_ui_permissions(user: Union[User, Principal]) -> FrozenSet[str]:
+    """Получить только UI-права пользователя (для отдачи на фронтенд)"""
+    all_permissions = get_user_permissions(user)
+    # Фильтруем только права с суффиксом _ui
+    return frozenset(perm for perm in all_permissions if perm.endswith("_ui"))
+
+
+def encode_permissions(permissions: FrozenSet[str]) -> int:
+    """Битовая маска известных прав (права вне PERMISSION_CODES в маску не попадают)"""
+    mask = 0
+    for code in permissions:
+        mask |= PERMISSION_BITS.get(code, 0)
+    return mask
+
+
+def build_permission_claims(user: Union[User, Principal]) -> Dict[str, Any]:
+    """
+    Claims прав для access token (ACCESS_TOKEN_PERMISSION_CLAIMS): adm - админ,
+    rid/rv - роль и ее версия на момент выдачи, perm - битовая маска прав роли
+    """
+    if not settings.ACCESS_TOKEN_PERMISSION_CLAIMS:
+        return {}
+    if user.is_admin:
+        return {"adm": 1}
+    if not user.role_id:
+        return {}
+    version = role_permission_cache.get_version(user.role_id)
+    if version is None:
+        return {}
+    return {
+        "rid": user.role_id,
+        "rv": version,
+        "perm": encode_permissions(role_permission_cache.get(user.role_id)),
+    }
+
+
+def check_permission_claim(payload: Dict[str, Any], user: Principal, permission_code: str) -> Optional[bool]:
+    """
+    Проверка права по claims токена без обращения к правам роли
+
+    Claims действительны, пока у пользователя та же роль (и признак админа), а версия
+    роли не изменилась. None - claims нет или они устарели, право проверяется обычным путем.
+    """
+    if payload.get("adm"):
+        return True if user.is_admin else None
+    if user.is_admin or "perm" not in payload:
+        return None
+
+    bit = PERMISSION_BITS.get(permission_code)
+    role_id = payload.get("rid")
+    if bit is None or not role_id or role_id != user.role_id:
+        return None
+    if payload.get("rv") != role_permission_cache.get_version(role_id):
+        return None
+    return bool(payload["perm"] & bit)
+
@@ -0,0 +1,62 @@
+from dataclasses import dataclass
+from typing import Optional
+
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.models.user import User
+from app.services.cache import VersionedCache
+
+PRINCIPAL_CACHE = "principals"
+
+
+@dataclass(frozen=True)
+class Principal:
+    """Авторизованный пользователь: поля users без связей, не привязан к сессии БД"""
+
+    id: str
+    username: str
+    email: Optional[str]
+    full_name: Optional[str]
+    is_admin: int
+    is_active: int
+    role_id: Optional[str]
+    created_at: str
+
+    @classmethod
+    def from_user(cls, user: User) -> "Principal":
+        return cls(
+            id=user.id,
+            username=user.username,
+            email=user.email,
+            full_name=user.full_name,
+            is_admin=user.is_admin,
+            is_active=user.is_active,
+            role_id=user.role_id,
+            created_at=user.created_at,
+        )
+
+
+class PrincipalCache(VersionedCache[str, Principal]):
+    """
+    Авторизованные пользователи в памяти процесса по user id
+
+    Запись живет PRINCIPAL_CACHE_TTL_SECONDS, поэтому проверка токена в большинстве
+    запросов (и в рукопожатии WebSocket) не обращается к БД. update_user/activate_user/
+    deactivate_user/delete_user после коммита вызывают event_bus.invalidate(PRINCIPAL_CACHE).
+    Отсутствующий пользователь не кешируется, поэтому create_user кеш не сбрасывает.
+    """
+
+    def __init__(self) -> None:
+        super().__init__(PRINCIPAL_CACHE, settings.PRINCIPAL_CACHE_TTL_SECONDS)
+
+    def load(self, db: Session, key: str) -> Optional[Principal]:
+        user = db.query(User).filter(User.id == key).first()
+        return Principal.from_user(user) if user is not None else None
+
+    def get(self, user_id: str, db: Optional[Session] = None) -> Optional[Principal]:
+        """Principal пользователя или None, если пользователя нет"""
+        return self.get_value(user_id, db)
+
+
+principal_cache = PrincipalCache()
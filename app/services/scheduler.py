@@ -0,0 +1,121 @@
+import asyncio
+import logging
+import time
+from datetime import datetime
+from typing import Callable, List, Optional
+
+import anyio
+from pytz import timezone
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class _DailyJob:
+    def __init__(
+        self,
+        name: str,
+        get_time: Callable[[], Optional[str]],
+        job: Callable[[str], None],
+        catch_up: bool,
+    ) -> None:
+        self.name = name
+        self.get_time = get_time
+        self.job = job
+        self.catch_up = catch_up
+        self.last_run_day: Optional[str] = None
+        self.checked = False
+
+
+class _IntervalJob:
+    def __init__(self, name: str, interval: float, job: Callable[[], None]) -> None:
+        self.name = name
+        self.interval = interval
+        self.job = job
+        self.next_run = 0.0
+
+
+class Scheduler:
+    """
+    Периодические задачи внутри процесса
+
+    Ежедневная задача запускается один раз в день, как только наступило время из get_time()
+    (HH:MM по TIMEZONE, None - задача отключена); задача с catch_up=False не запускается
+    при старте процесса, если ее время сегодня уже прошло. Время читается на каждом шаге, поэтому
+    изменение настроек применяется без перезапуска. Периодическая задача запускается на
+    первом шаге после старта и затем раз в interval секунд. Задачи синхронные и выполняются
+    вне event loop. При нескольких воркерах задача запускается в каждом - она должна быть
+    идемпотентной.
+    """
+
+    def __init__(self) -> None:
+        self._daily: List[_DailyJob] = []
+        self._interval: List[_IntervalJob] = []
+        self._task: Optional[asyncio.Task] = None
+
+    def add_daily(
+        self,
+        name: str,
+        get_time: Callable[[], Optional[str]],
+        job: Callable[[str], None],
+        catch_up: bool = True,
+    ) -> None:
+        """job получает дату запуска (YYYY-MM-DD)"""
+        self._daily.append(_DailyJob(name, get_time, job, catch_up))
+
+    def add_interval(self, name: str, interval: float, job: Callable[[], None]) -> None:
+        self._interval.append(_IntervalJob(name, interval, job))
+
+    async def start(self) -> None:
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(settings.SCHEDULER_TICK_SECONDS)
+            await self.tick()
+
+    async def tick(self) -> None:
+        now = datetime.now(timezone(settings.TIMEZONE))
+        day_key = now.strftime("%Y-%m-%d")
+        current_time = now.strftime("%H:%M")
+
+        for daily in self._daily:
+            if daily.last_run_day == day_key:
+                continue
+            try:
+                run_at = await anyio.to_thread.run_sync(daily.get_time)
+                first_check, daily.checked = not daily.checked, True
+                if run_at is None or current_time < run_at:
+                    continue
+                daily.last_run_day = day_key
+                if first_check and not daily.catch_up:
+                    # Время прошло до старта процесса - ждем следующего дня
+                    continue
+                logger.info("Запуск задачи %s за %s", daily.name, day_key)
+                await anyio.to_thread.run_sync(daily.job, day_key)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Ошибка выполнения задачи %s", daily.name)
+
+        for interval in self._interval:
+            started = time.monotonic()
+            if started < interval.next_run:
+                continue
+            interval.next_run = started + interval.interval
+            try:
+                await anyio.to_thread.run_sync(interval.job)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Ошибка выполнения задачи %s", interval.name)
+
+
+scheduler = Scheduler()
@@ -1,15 +1,26 @@
-from typing import Any, Dict
+import json
+import logging
+from typing import Any, Dict, Optional
 
+from sqlalchemy.orm import Session
+
+from app.models.setting import Setting
 from app.schemas.setting import NOTIFICATION_TYPES, NOTIFICATION_TYPE_CODES
+from app.services.cache import VersionedCache
+from app.services.notification_providers import NOTIFICATION_PROVIDERS
+
+logger = logging.getLogger(__name__)
+
+SETTINGS_CACHE = "settings"
 
 
 def build_default_notifications() -> Dict[str, Any]:
     return {
-        "providers": {
-            "max_via_green_api": {"enabled": False},
-            "telegram": {"enabled": False},
-        },
+        "providers": {code: {"enabled": False} for code in NOTIFICATION_PROVIDERS},
         "enabled_notification_types": list(NOTIFICATION_TYPE_CODES),
+        "digest_window_seconds": 0,
+        "daily_summary_enabled": False,
+        "daily_summary_time": "18:00",
     }
 
 
@@ -29,6 +40,15 @@ def normalize_notifications(value: Any) -> Dict[str, Any]:
     if isinstance(enabled_types, list):
         defaults["enabled_notification_types"] = enabled_types
 
+    digest_window = value.get("digest_window_seconds")
+    if isinstance(digest_window, int) and digest_window >= 0:
+        defaults["digest_window_seconds"] = digest_window
+
+    defaults["daily_summary_enabled"] = bool(value.get("daily_summary_enabled"))
+    summary_time = value.get("daily_summary_time")
+    if isinstance(summary_time, str) and summary_time:
+        defaults["daily_summary_time"] = summary_time
+
     return defaults
 
 
@@ -58,6 +78,50 @@ def normalize_pass_integration(value: Any) -> Dict[str, Any]:
 def build_settings_metadata() -> Dict[str, Any]:
     return {
         "notifications": {
-            "available_types": NOTIFICATION_TYPES
+            "available_types": NOTIFICATION_TYPES,
+            "available_providers": [
+                {"code": code, "title": provider.title, "required_fields": list(provider.required_fields)}
+                for code, provider in NOTIFICATION_PROVIDERS.items()
+            ],
         }
     }
+
+
+def load_settings_data(db: Session) -> Dict[str, Any]:
+    """Все настройки из БД в нормализованном виде: {"notifications": ..., "pass_integration": ...}"""
+    settings_data: Dict[str, Any] = {}
+    for record in db.query(Setting).all():
+        if record.value:
+            try:
+                settings_data[record.key] = json.loads(record.value)
+            except json.JSONDecodeError:
+                logger.exception("Не удалось распарсить настройки %s", record.key)
+                settings_data[record.key] = {}
+        else:
+            settings_data[record.key] = {}
+
+    return {
+        "notifications": normalize_notifications(settings_data.get("notifications")),
+        "pass_integration": normalize_pass_integration(settings_data.get("pass_integration")),
+    }
+
+
+class SettingsCache(VersionedCache[None, Dict[str, Any]]):
+    """
+    Настройки в памяти процесса
+
+    Читаются из БД один раз и до изменения: update_settings после коммита вызывает
+    event_bus.invalidate(SETTINGS_CACHE).
+    """
+
+    def __init__(self) -> None:
+        super().__init__(SETTINGS_CACHE)
+
+    def load(self, db: Session, key: None) -> Dict[str, Any]:
+        return load_settings_data(db)
+
+    def get(self, db: Optional[Session] = None) -> Dict[str, Any]:
+        return self.get_value(None, db)
+
+
+settings_cache = SettingsCache()
@@ -0,0 +1,37 @@
+import logging
+from datetime import datetime
+from typing import Optional
+
+from app.config import settings
+from app.database import SessionLocal
+from app.services.auth import cleanup_expired_tokens
+from app.services.scheduler import scheduler
+
+logger = logging.getLogger(__name__)
+
+
+def get_refresh_token_cleanup_time() -> Optional[str]:
+    """Время ежедневной очистки (HH:MM) или None, если она отключена"""
+    if not settings.REFRESH_TOKEN_CLEANUP_AT:
+        return None
+    try:
+        return datetime.strptime(settings.REFRESH_TOKEN_CLEANUP_AT, "%H:%M").strftime("%H:%M")
+    except ValueError:
+        logger.warning("Некорректное REFRESH_TOKEN_CLEANUP_AT: %s", settings.REFRESH_TOKEN_CLEANUP_AT)
+        return None
+
+
+def prune_refresh_tokens(day_key: Optional[str] = None) -> None:
+    """Удалить истекшие и отозванные refresh token (вместо очистки в каждом /login и /refresh)"""
+    db = SessionLocal()
+    try:
+        deleted = cleanup_expired_tokens(db, settings.REFRESH_TOKEN_CLEANUP_BATCH_SIZE)
+        if deleted:
+            logger.info("Удалено истекших и отозванных refresh token: %d", deleted)
+    finally:
+        db.close()
+
+
+# Раз в сутки в нерабочее время; при перезапуске днем очистка не запускается во всех
+# воркерах сразу, а ждет следующей ночи
+scheduler.add_daily("refresh_token_cleanup", get_refresh_token_cleanup_time, prune_refresh_tokens, catch_up=False)
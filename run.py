@@ -1,8 +1,9 @@
 #!/usr/bin/env python3
 """
 Скрипт запуска сервера
-Использует настройки HOST и PORT из app.config
+Использует настройки HOST, PORT и WORKERS из app.config
 """
+import logging
 import os
 import uvicorn
 from app.config import settings
@@ -11,10 +12,21 @@ if __name__ == "__main__":
     # Отключаем reload в production (когда запускается через systemd)
     # Reload работает только при прямом запуске скрипта
     reload = os.environ.get("RELOAD", "false").lower() == "true"
+    # С reload uvicorn запускает один процесс
+    workers = 1 if reload else settings.WORKERS
+
+    if workers > 1 and settings.EVENT_BUS_BACKEND == "memory":
+        logging.getLogger(__name__).warning(
+            "WORKERS=%d при EVENT_BUS_BACKEND=memory: события одного воркера не дойдут до клиентов других. "
+            "Используйте EVENT_BUS_BACKEND=database или redis",
+            workers,
+        )
     
     uvicorn.run(
         "app.main:app",
         host=settings.HOST,
         port=settings.PORT,
         reload=reload,
+        workers=workers,
+        ws_per_message_deflate=settings.WS_PER_MESSAGE_DEFLATE,
     )